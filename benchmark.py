@@ -0,0 +1,926 @@
+"""
+Reproducible benchmarks against the local mock server (mock_server.py).
+
+    python benchmark.py                       # full run, results written to bench_results.json
+    python benchmark.py --quick               # smaller user counts and catalogs
+    python benchmark.py --suite select        # only one suite
+    python benchmark.py --compare old.json new.json
+
+Every scenario runs in a fresh child process so CPU time and peak RSS belong to that scenario only.
+The child gets a synthetic `custom` module, so your own custom.py is never read or modified,
+and runs in a temporary directory, so your journal, event log, caches and seat record are not either.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FIRST_LESSON_ID = 100000
+SELECT_COURSES = 400
+COURSES_PER_USER = 4
+BATCH_COURSES_PER_USER = 8
+BATCH_LATENCY = 0.02  # Seconds the mock adds to every response, so round trips cost what they do on a network
+ENDLESS_SECONDS = 5.0
+WORKERS_USERS = 200
+RECORDING_LESSONS = 3000
+RECORDING_POLLS = 86400  # A day of 1s polls
+
+FULL_PLAN = {
+    "select": [1, 10, 100, 500],
+    "validate": [100, 1000],
+    "inquire": [1000, 10000, 100000],
+    "micro_rounds": 20000,
+    "parser": [1000, 10000, 50000],
+    "memory": [10000, 100000],
+    "events": 100000,
+    "batch": [1, 10, 100],
+    "journal": [100000, 500000],
+    "seatrec": [2, 20],
+    "workers": [1, 2, 4],
+    "replay": [10, 100],
+}
+QUICK_PLAN = {
+    "select": [1, 10],
+    "validate": [100],
+    "inquire": [1000],
+    "micro_rounds": 2000,
+    "parser": [1000],
+    "memory": [10000],
+    "events": 10000,
+    "batch": [10],
+    "journal": [100000],
+    "seatrec": [2],
+    "workers": [1, 2],
+    "replay": [10],
+}
+INQUIRY_QUERIES = ["高等数学", "teacher=王", "type=必修", "no=l1000", "nothing-matches"]
+SUITES = ["select", "validate", "inquire", "classifier", "parser", "memory", "eventlog", "batch", "journal", "seatrec", "workers", "replay"]
+
+
+def percentile(samples: list[float], fraction: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def mock_server(courses: int, extra_args: list[str] | None = None):
+    """
+    Runs mock_server.py in its own process so its CPU time is not counted against the client.
+    """
+    with local_server(["mock_server.py", "--courses", str(courses), *(extra_args or [])]) as base_url:
+        yield base_url
+
+
+@contextlib.contextmanager
+def local_server(args: list[str]):
+    """
+    Runs a server script with --port in its own process and yields its base URL once it accepts connections.
+    """
+    port = free_port()
+    command = [sys.executable, *args, "--port", str(port)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            with socket.socket() as sock:
+                if sock.connect_ex(("127.0.0.1", port)) == 0:
+                    break
+            time.sleep(0.05)
+        else:
+            raise RuntimeError("mock server did not start")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def make_user_configs(users: int, courses_per_user: int = COURSES_PER_USER, nodes: int = 4) -> list[dict]:
+    user_configs = []
+    for index in range(users):
+        first = (index * courses_per_user) % SELECT_COURSES
+        course_ids = [str(FIRST_LESSON_ID + (first + offset) % SELECT_COURSES) for offset in range(courses_per_user)]
+        user_configs.append(
+            {
+                "label": f"bench{index}",
+                "tables": [{"profileId": "1", "course_ids": course_ids}],
+                "cookies": {"JSESSIONID": f"bench{index}", "SERVERNAME": f"c{index % nodes + 1}"},
+            }
+        )
+    return user_configs
+
+
+def install_custom(users: int, courses_per_user: int = COURSES_PER_USER, nodes: int = 4, directory: str | None = None):
+    """
+    Installs a synthetic custom module. With a directory it is also written there as custom.py
+    and the directory is put first on sys.path, for the --workers processes that import it themselves.
+    """
+    settings = {
+        "USE_PROXY": False,
+        "proxies": {},
+        "USER_CONFIGS": make_user_configs(users, courses_per_user, nodes),
+        "INQUIRY_USER_DATA": {
+            "label": "bench_inquiry",
+            "profileId": ["1"],
+            "cookies": {"JSESSIONID": "bench_inquiry", "SERVERNAME": "c1"},
+        },
+        "ENROLLMENT_DATA_API_PARAMS": {"projectId": "1", "semesterId": "1"},
+    }
+    custom = types.ModuleType("custom")
+    custom.__dict__.update(settings)
+    sys.modules["custom"] = custom
+    if directory:
+        with open(os.path.join(directory, "custom.py"), "w", encoding="utf-8") as f:
+            f.writelines(f"{name} = {value!r}\n" for name, value in settings.items())
+        sys.path.insert(0, directory)
+
+
+def timed(function, latencies: list[float]):
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = await function(*args, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+def summarize(name: str, params: dict, requests: int, wall: float, cpu: float, latencies: list[float]) -> dict:
+    p50 = percentile(latencies, 0.50)
+    p99 = percentile(latencies, 0.99)
+    return {
+        "name": name,
+        "params": params,
+        "requests": requests,
+        "wall_s": round(wall, 4),
+        "requests_per_s": round(requests / wall, 1) if wall else None,
+        "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+        "cpu_us_per_request": round(cpu / requests * 1e6, 1) if requests else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+async def bench_select(params: dict) -> dict:
+    import main_select_courses as selection
+
+    latencies: list[float] = []
+    selection.attempt_course_selection = timed(selection.attempt_course_selection, latencies)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if params["endless"]:
+        try:
+            await asyncio.wait_for(selection.main_select_courses(endless=True), ENDLESS_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    else:
+        await selection.main_select_courses()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    name = "select_endless" if params["endless"] else "select"
+    return summarize(name, params, len(latencies), wall, cpu, latencies)
+
+
+async def bench_batch(params: dict) -> dict:
+    """
+    One pass over 8 courses per user, sent one per request or packed into batches: round
+    trips and the time from the start of the run until each course is selected.
+    """
+    import main_select_courses as selection
+    from metrics import METRICS
+
+    latencies: list[float] = []
+    selection.attempt_course_selection = timed(selection.attempt_course_selection, latencies)
+    selection.BATCH_SIZE = params["batch_size"]
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    run_start = time.monotonic()
+    await selection.main_select_courses()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    result = summarize("batch", params, len(latencies), wall, cpu, latencies)
+    result["round_trips_per_user"] = round(len(latencies) / params["users"], 2)
+    seconds = [METRICS.first_attempt[key] + elapsed - run_start for key, elapsed in METRICS.time_to_success.items()]
+    result["selected"] = len(seconds)
+    result["time_to_success_p50_ms"] = round(percentile(seconds, 0.50) * 1000, 1) if seconds else None
+    result["time_to_success_max_ms"] = round(max(seconds) * 1000, 1) if seconds else None
+    return result
+
+
+def children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def bench_workers(params: dict) -> dict:
+    """
+    --endless selection for ENDLESS_SECONDS with the users sharded across that many processes
+    (1 is the single-process loop). Every user has its own SERVERNAME, so the per-node budgets
+    do not cap the rate. Requests are counted by the mock server, and the CPU time includes
+    the worker processes.
+    """
+    import aiohttp
+
+    import main_select_courses as selection
+
+    cpu_start = time.process_time() + children_cpu()
+    wall_start = time.perf_counter()
+    try:
+        await asyncio.wait_for(selection.main_select_courses(endless=True, workers=params["workers"]), ENDLESS_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() + children_cpu() - cpu_start
+
+    async with aiohttp.ClientSession() as session, session.get(f"{os.environ['SHIEP_BASE_URL']}/mock/stats") as response:
+        requests = (await response.json()).get("batchOperator", 0)
+    return summarize("workers", params, requests, wall, cpu, [])
+
+
+async def bench_validate(params: dict) -> dict:
+    import verify_cookie_validity as validation
+
+    latencies: list[float] = []
+    validation.check = timed(validation.check, latencies)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    await validation.verify_cookie_validity()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return summarize("validate", params, len(latencies), wall, cpu, latencies)
+
+
+async def bench_inquire(params: dict) -> dict:
+    import inquire_course_info as inquiry
+    from course_index import CourseIndex
+    from course_store import CourseStore, EnrollmentTable
+    from custom import INQUIRY_USER_DATA
+    from http_pool import SharedPool
+
+    cookies = INQUIRY_USER_DATA["cookies"]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    async with SharedPool(owner_label="Benchmark") as pool:
+        session = pool.session(INQUIRY_USER_DATA["label"])
+        courses = await inquiry.get_course_data(session, "1", cookies)
+        load_done = time.perf_counter()
+        enrollments = await inquiry.get_enrollment_data(session, cookies)
+    wall = time.perf_counter() - wall_start
+
+    index_start = time.perf_counter()
+    store = CourseStore()
+    store.add_all(courses)
+    store.set_enrollments(EnrollmentTable(enrollments))
+    index = CourseIndex(store)
+    index_build = time.perf_counter() - index_start
+
+    courses = legacy_layout(courses)
+
+    legacy_latencies: list[float] = []
+    query_latencies: list[float] = []
+    for keyword in INQUIRY_QUERIES:
+        start = time.perf_counter()
+        filtered = legacy_filter_courses(courses, keyword, enrollments)
+        filtered.sort(key=lambda x: (x["type"], -x["credits"], x["id"]))
+        legacy_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        index.search(keyword)
+        query_latencies.append(time.perf_counter() - start)
+    for keyword in ["teacher=王 type=必修 free>0", "credits>=3 free>0"]:
+        start = time.perf_counter()
+        index.search(keyword)
+        query_latencies.append(time.perf_counter() - start)
+    cpu = time.process_time() - cpu_start
+
+    result = summarize("inquire", params, 2, wall, cpu, query_latencies)
+    result["load_catalog_s"] = round(load_done - wall_start, 4)
+    result["index_build_s"] = round(index_build, 4)
+    result["query_p50_ms"] = result.pop("p50_ms")
+    result["query_p99_ms"] = result.pop("p99_ms")
+    result["legacy_query_p50_ms"] = round(percentile(legacy_latencies, 0.50) * 1000, 3)
+    result["legacy_query_p99_ms"] = round(percentile(legacy_latencies, 0.99) * 1000, 3)
+    return result
+
+
+def legacy_layout(courses: list) -> list[dict]:
+    """
+    The renamed dict-per-lesson list inquire_course_info kept before course_store.
+    """
+    key_mapping = {"id": "id", "no": "no", "name": "name", "credits": "credits", "courseTypeName": "type", "teachers": "teacher"}
+    return [{new_key: course.get(old_key, "") for old_key, new_key in key_mapping.items()} for course in courses]
+
+
+def legacy_filter_courses(courses: list, keyword: str, enrollments: dict):
+    """
+    The linear-scan search as it was before course_index, kept as a baseline.
+    """
+    filtered_courses_list = []
+    # Check if keyword is in "key=value" format
+    if "=" in keyword:
+        key, value = keyword.split("=", 1)
+        key = key.strip().lower()
+        value = value.strip().lower()
+    else:
+        key = "name"  # Default to searching name
+        value = keyword.lower()
+    for course in courses:
+        search_field = str(course.get(key, "")).lower()
+        if value in search_field:
+            lesson_id = str(course["id"])
+            sc = enrollments.get(lesson_id, {}).get("sc", "N/A")
+            lc = enrollments.get(lesson_id, {}).get("lc", "N/A")
+            filtered_courses_list.append(
+                {
+                    "id": course["id"],
+                    "no": course["no"],
+                    "name": course["name"],
+                    "credits": course["credits"],
+                    "type": course["type"],
+                    "teacher": course["teacher"],
+                    "enrolled": sc,
+                    "limit": lc,
+                }
+            )
+    return filtered_courses_list
+
+
+def legacy_classify(response_text: str) -> str:
+    """
+    The batchOperator classification as it was before response_classifier, kept as a baseline.
+    """
+    from config import failed_words, error_words
+
+    if "已经选过" in response_text or not (any(word in response_text for word in failed_words) or any(word in response_text for word in error_words)):
+        return "already" if "已经选过" in response_text else "success"
+    elif any(word in response_text for word in failed_words):
+        return f"failed {response_text.strip()}"
+    elif "当前选课不开放" in response_text:
+        return "closed"
+    elif "请不要过快点击" in response_text:
+        return "throttled"
+    elif any(word in response_text for word in error_words):
+        return f"error {response_text.strip()}"
+    return f"unclear {response_text.strip()}"
+
+
+def bench_classifier(rounds: int) -> list[dict]:
+    from response_classifier import CLASSIFIER
+
+    padding = "<tr><td>" + "x" * 80 + "</td></tr>\n"
+    samples = {
+        "success": "<div>\n100001 选课成功\n</div>",
+        "full": "<div>\n100001 选课失败:人数已满\n</div>",
+        "throttled": "请不要过快点击",
+        "error_page_50k": "<html>" + padding * 550 + "503 Service Unavailable</html>",
+    }
+    results = []
+    for sample_name, text in samples.items():
+        timings = {}
+        for method_name, method in (("legacy", legacy_classify), ("compiled", CLASSIFIER.classify)):
+            start = time.perf_counter()
+            for _ in range(rounds):
+                method(text)
+            timings[method_name] = (time.perf_counter() - start) / rounds * 1e9
+        results.append(
+            {
+                "name": "classifier",
+                "params": {"sample": sample_name, "bytes": len(text.encode())},
+                "legacy_ns": round(timings["legacy"], 1),
+                "compiled_ns": round(timings["compiled"], 1),
+                "speedup": round(timings["legacy"] / timings["compiled"], 2),
+            }
+        )
+    return results
+
+
+def legacy_parse(raw_data: str):
+    """
+    The regex fix-up parsing as it was before course_parser, kept as a baseline.
+    """
+    import re
+
+    data_str = re.search(r"\[.*\]", raw_data.strip(), re.DOTALL).group()
+    try:
+        return json.loads(data_str)
+    except json.JSONDecodeError:
+        data_str = re.sub(r"(?<!\\)'", '"', data_str)
+        data_str = re.sub(r"(?<=[{,])\s*([a-zA-Z_]\w*)\s*:", r'"\1":', data_str)
+        return json.loads(data_str)
+
+
+def bench_parser(catalog_sizes: list[int]) -> list[dict]:
+    from course_parser import LiteralParser, parse_js_literal
+    from mock_server import MockEAMS
+
+    results = []
+    for courses in catalog_sizes:
+        server = MockEAMS(courses=courses)
+        literals = ",".join(course.to_js_literal() for course in server.courses.values())
+        text = f"var lessonJSONs = [{literals}];"
+
+        timings = {}
+        start = time.perf_counter()
+        expected = legacy_parse(text)
+        timings["legacy_ms"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parsed = parse_js_literal(text)
+        timings["single_pass_ms"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parser = LiteralParser()
+        for index in range(0, len(text), 65536):
+            parser.feed(text[index : index + 65536])
+        chunked = parser.close()
+        timings["chunked_64k_ms"] = time.perf_counter() - start
+
+        if parsed != expected or chunked != expected:
+            raise RuntimeError("course_parser disagrees with the legacy parser")
+        result = {"name": "parser", "params": {"courses": courses, "bytes": len(text.encode())}}
+        result.update({key: round(value * 1000, 2) for key, value in timings.items()})
+        result["speedup"] = round(timings["legacy_ms"] / timings["single_pass_ms"], 2)
+        results.append(result)
+    return results
+
+
+def bench_memory(catalog_sizes: list[int]) -> list[dict]:
+    """
+    Memory kept alive after loading a catalog plus its queryStdCount data and listing every
+    lesson: the dict-of-dicts layout against CourseStore/EnrollmentTable (index reported apart).
+    """
+    import gc
+    import tracemalloc
+
+    from course_index import CourseIndex
+    from course_parser import parse_js_literal
+    from course_store import CourseStore, EnrollmentTable
+    from mock_server import MockEAMS
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        kept = build()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del kept
+        return round(current / 2**20, 2), round(peak / 2**20, 2)
+
+    def build_legacy():
+        courses = legacy_layout(parse_js_literal(catalog_text))
+        enrollments = parse_js_literal(counts_text, start="{")
+        return courses, enrollments, legacy_filter_courses(courses, "", enrollments)
+
+    def build_store():
+        store = CourseStore()
+        store.add_all(parse_js_literal(catalog_text))
+        store.set_enrollments(EnrollmentTable(parse_js_literal(counts_text, start="{")))
+        return store, list(range(len(store)))
+
+    results = []
+    for courses in catalog_sizes:
+        server = MockEAMS(courses=courses)
+        catalog_text = "var lessonJSONs = [" + ",".join(course.to_js_literal() for course in server.courses.values()) + "];"
+        counts_text = "window.lessonId2Counts={" + ",".join(
+            f"'{lesson_id}':{{sc:{course.sc},lc:{course.lc}}}" for lesson_id, course in server.courses.items()
+        ) + "}"
+
+        result = {"name": "memory", "params": {"courses": courses}}
+        result["dicts_mb"], result["dicts_peak_mb"] = measure(build_legacy)
+        result["store_mb"], result["store_peak_mb"] = measure(build_store)
+        store = build_store()[0]
+        result["index_mb"] = measure(lambda: CourseIndex(store))[0]
+        result["ratio"] = round(result["dicts_mb"] / result["store_mb"], 2)
+        results.append(result)
+    return results
+
+
+def bench_event_loop_lag(events: int) -> list[dict]:
+    """
+    Event-loop lag while 100 tasks report attempts: print() to a line-buffered file (a stand-in
+    for the terminal, which is slower still) against event_log.EventLog. A probe task asks to
+    wake up every 5 ms and records how late it was.
+    """
+    import tempfile
+
+    from event_log import Event, EventLog
+
+    users = 100
+    body = "<div>" + "选课失败:人数已满 " * 20 + "</div>"
+
+    async def run(emit) -> dict:
+        lags: list[float] = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lags.append(time.perf_counter() - start - 0.005)
+
+        async def user(index: int):
+            for attempt in range(events // users):
+                emit(index, attempt)
+                await asyncio.sleep(0)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(user(index) for index in range(users)))
+        wall = time.perf_counter() - start
+        done.set()
+        await probe_task
+        return {
+            "events_per_s": round(events / wall, 1),
+            "lag_p50_ms": round(percentile(lags, 0.50) * 1000, 3),
+            "lag_p99_ms": round(percentile(lags, 0.99) * 1000, 3),
+            "lag_max_ms": round(max(lags) * 1000, 3),
+        }
+
+    async def with_print(sink) -> dict:
+        def emit(index: int, attempt: int):
+            print(f"User bench{index} (1) - Course ID {100000 + attempt}: Status 200", file=sink)
+            print(f"User bench{index} (1) - Course ID {100000 + attempt}: Non-200 Status 200 (response: {body.strip()}).\n", file=sink)
+
+        return await run(emit)
+
+    async def with_event_log(path: str) -> dict:
+        log = EventLog(path, max_bytes=0, backups=0, flush_interval=0.5, console_level="info", console_rate=20)
+
+        def emit(index: int, attempt: int):
+            log.emit(Event.RETRYABLE, user=f"bench{index}", profile="1", course=str(100000 + attempt), outcome="full", word="已满")
+
+        async with log:
+            return await run(emit)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "console.txt"), "w", encoding="utf-8", buffering=1) as sink:
+            result = {"name": "event_loop_lag", "params": {"events": events, "mode": "print"}}
+            result.update(asyncio.run(with_print(sink)))
+            results.append(result)
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            result = {"name": "event_loop_lag", "params": {"events": events, "mode": "event_log"}}
+            result.update(asyncio.run(with_event_log(os.path.join(directory, "events.jsonl"))))
+        results.append(result)
+    return results
+
+
+def bench_journal(record_counts: list[int]) -> list[dict]:
+    """
+    Writing that many task state changes through journal.Journal (fsync batched), then the
+    --resume replay before and after compaction. A real run writes a few records per task,
+    so these sizes stand for journals far larger than any selection window produces.
+    """
+    import tempfile
+
+    from journal import Journal, TaskState, compact, replay
+    from task_plan import Task
+
+    states = list(TaskState)
+
+    async def write(path: str, count: int) -> tuple[float, int]:
+        journal = Journal(path, flush_interval=0.2)
+        await journal.open(resume=False)
+        start = time.perf_counter()
+        for index in range(count):
+            journal.record(Task(f"bench{index % 500}", "1", str(FIRST_LESSON_ID + index % 4000)), states[index % len(states)])
+            if index % 1000 == 0:
+                await asyncio.sleep(0)
+        await journal.close()
+        return time.perf_counter() - start, journal.syncs
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in record_counts:
+            path = os.path.join(directory, f"journal{count}.jsonl")
+            with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+                write_s, syncs = asyncio.run(write(path, count))
+            result = {"name": "journal", "params": {"records": count}, "file_mb": round(os.path.getsize(path) / 2**20, 1)}
+            result["write_s"] = round(write_s, 3)
+            result["fsyncs"] = syncs
+
+            start = time.perf_counter()
+            replayed = replay(path)
+            result["replay_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            compact(path, replayed)
+            start = time.perf_counter()
+            replay(path)
+            result["replay_after_compact_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            result["tasks"] = len(replayed)
+            results.append(result)
+    return results
+
+
+def bench_seat_recording(changes_per_poll: list[int]) -> list[dict]:
+    """
+    A day of 1s queryStdCount polls of RECORDING_LESSONS lessons through seat_recorder, with
+    that many lessons changing per poll, then the offline queries on the memory map.
+    record_ms is one poll of the whole catalog, which is what a live poll pays.
+    """
+    import random
+    import tempfile
+
+    from seat_recorder import SeatHistory, SeatRecorder
+
+    rng = random.Random(1)
+    lesson_ids = [str(FIRST_LESSON_ID + index) for index in range(RECORDING_LESSONS)]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for changes in changes_per_poll:
+            path = os.path.join(directory, f"seats{changes}.seatrec")
+            catalog = {lesson_id: {"sc": rng.randint(0, 60), "lc": 60} for lesson_id in lesson_ids}
+            recorder = SeatRecorder(path)
+            recorder.open()
+            start = time.perf_counter()
+            recorder.record(catalog, at=0.0)
+            for poll in range(1, RECORDING_POLLS):
+                changed = {}
+                for lesson_id in rng.sample(lesson_ids, changes):
+                    counts = catalog[lesson_id]
+                    counts["sc"] = max(0, min(counts["lc"], counts["sc"] + rng.choice((-1, 1))))
+                    changed[lesson_id] = counts
+                recorder.record(changed, at=float(poll))
+            write_s = time.perf_counter() - start
+            catalog[lesson_ids[0]]["sc"] ^= 1
+            start = time.perf_counter()
+            recorder.record(catalog, at=float(RECORDING_POLLS))
+            record_ms = (time.perf_counter() - start) * 1000
+            with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+                recorder.close()
+
+            result = {"name": "seatrec", "params": {"lessons": RECORDING_LESSONS, "polls": RECORDING_POLLS, "changes_per_poll": changes}}
+            result["file_mb"] = round(os.path.getsize(path) / 2**20, 2)
+            result["write_s"] = round(write_s, 2)
+            result["record_ms"] = round(record_ms, 2)
+            start = time.perf_counter()
+            history = SeatHistory(path)
+            result["open_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            start = time.perf_counter()
+            history.free_seat_timeline(lesson_ids[len(lesson_ids) // 2])
+            result["timeline_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            start = time.perf_counter()
+            history.churn().most_common(10)
+            result["top_churn_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            history.close()
+            results.append(result)
+    return results
+
+
+def bench_replay(user_counts: list[int]) -> list[dict]:
+    """
+    Records the selection loop through cassette.py in front of the mock server, then runs it
+    again against the replayed cassette. The replay answers every request the same way each
+    time, so its CPU time per request can be compared between revisions without the mock
+    server's seat counts changing underneath.
+    """
+    from cassette import read_cassette
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for users in user_counts:
+            path = os.path.join(directory, f"select{users}.cassette")
+            params = {"users": users, "endless": False}
+            with mock_server(SELECT_COURSES) as upstream, local_server(["cassette.py", "record", path, "--upstream", upstream]) as base_url:
+                spawn_child("select", base_url, params)
+            with local_server(["cassette.py", "replay", path, "--fast"]) as base_url:
+                result = spawn_child("select", base_url, params)
+            result["name"] = "replay"
+            result["exchanges"] = len(read_cassette(path)[1])
+            result["cassette_kb"] = round(os.path.getsize(path) / 1024, 1)
+            results.append(result)
+    return results
+
+
+CHILD_SCENARIOS = {
+    "select": bench_select,
+    "batch": bench_batch,
+    "workers": bench_workers,
+    "validate": bench_validate,
+    "inquire": bench_inquire,
+}
+
+
+def run_child(spec: dict) -> dict:
+    """
+    Runs one scenario in this (fresh) process. stdout from the scripts is discarded.
+    Files the scripts write (relative paths in config.py) go to a temporary directory.
+    """
+    os.environ["SHIEP_BASE_URL"] = spec["base_url"]
+    params = spec["params"]
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w", encoding="utf-8") as devnull:
+        if "workers" in params:
+            install_custom(params["users"], nodes=params["users"], directory=directory)
+        else:
+            install_custom(params.get("users", 1), params.get("courses_per_user", COURSES_PER_USER))
+        with contextlib.chdir(directory), contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            return asyncio.run(CHILD_SCENARIOS[spec["scenario"]](params))
+
+
+def spawn_child(scenario: str, base_url: str, params: dict) -> dict:
+    spec = json.dumps({"scenario": scenario, "base_url": base_url, "params": params})
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", spec],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_result(result: dict):
+    fields = [f"{key}={value}" for key, value in result.items() if key not in ("name", "params") and value is not None]
+    print(f"  {result['name']:<16} {json.dumps(result['params'], ensure_ascii=False):<36} " + " ".join(fields))
+
+
+def run_suites(suites: list[str], plan: dict) -> list[dict]:
+    results = []
+    if "select" in suites:
+        print("Selection loop:")
+        for endless in (False, True):
+            for users in plan["select"]:
+                with mock_server(SELECT_COURSES) as base_url:
+                    result = spawn_child("select", base_url, {"users": users, "endless": endless})
+                print_result(result)
+                results.append(result)
+
+    if "batch" in suites:
+        print(f"Batch submission ({BATCH_COURSES_PER_USER} courses per user, {BATCH_LATENCY * 1000:.0f} ms server latency):")
+        for users in plan["batch"]:
+            for batch_size in (1, BATCH_COURSES_PER_USER):
+                params = {"users": users, "courses_per_user": BATCH_COURSES_PER_USER, "batch_size": batch_size}
+                with mock_server(SELECT_COURSES, ["--latency", str(BATCH_LATENCY)]) as base_url:
+                    result = spawn_child("batch", base_url, params)
+                print_result(result)
+                results.append(result)
+
+    if "workers" in suites:
+        print(f"Sharded selection ({WORKERS_USERS} users, --endless for {ENDLESS_SECONDS:.0f}s):")
+        for workers in plan["workers"]:
+            with mock_server(SELECT_COURSES) as base_url:
+                result = spawn_child("workers", base_url, {"users": WORKERS_USERS, "workers": workers})
+            print_result(result)
+            results.append(result)
+
+    if "replay" in suites:
+        print("Selection loop replayed from a cassette (recorded against the mock server, replayed with --fast):")
+        for result in bench_replay(plan["replay"]):
+            print_result(result)
+            results.append(result)
+
+    if "validate" in suites:
+        print("Cookie validation:")
+        for users in plan["validate"]:
+            with mock_server(10) as base_url:
+                result = spawn_child("validate", base_url, {"users": users})
+            print_result(result)
+            results.append(result)
+
+    if "inquire" in suites:
+        print("Course inquiry:")
+        for courses in plan["inquire"]:
+            with mock_server(courses) as base_url:
+                result = spawn_child("inquire", base_url, {"courses": courses})
+            print_result(result)
+            results.append(result)
+
+    if "classifier" in suites:
+        print("Response classifier (in-process micro-benchmark):")
+        for result in bench_classifier(plan["micro_rounds"]):
+            print_result(result)
+            results.append(result)
+
+    if "parser" in suites:
+        print("Course data parser (in-process):")
+        for result in bench_parser(plan["parser"]):
+            print_result(result)
+            results.append(result)
+
+    if "memory" in suites:
+        print("Catalog memory (in-process, tracemalloc):")
+        for result in bench_memory(plan["memory"]):
+            print_result(result)
+            results.append(result)
+
+    if "journal" in suites:
+        print("Selection journal (in-process):")
+        for result in bench_journal(plan["journal"]):
+            print_result(result)
+            results.append(result)
+
+    if "seatrec" in suites:
+        print("Seat recording (in-process):")
+        for result in bench_seat_recording(plan["seatrec"]):
+            print_result(result)
+            results.append(result)
+
+    if "eventlog" in suites:
+        print("Event-loop lag while logging (in-process):")
+        for result in bench_event_loop_lag(plan["events"]):
+            print_result(result)
+            results.append(result)
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path: str, new_path: str):
+    """
+    Prints the relative change of every numeric figure between two result files.
+    """
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def key(result: dict) -> str:
+        return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+
+    old_results = {key(result): result for result in old["results"]}
+    print(f"Comparing {old.get('revision')} -> {new.get('revision')}")
+    for result in new["results"]:
+        before = old_results.get(key(result))
+        if before is None:
+            continue
+        changes = []
+        for field, value in result.items():
+            previous = before.get(field)
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+                changes.append(f"{field} {previous} -> {value} ({(value - previous) / previous:+.1%})")
+        print(f"{key(result)}\n    " + "\n    ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks against the local mock server.")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="run only these suites")
+    parser.add_argument("--quick", action="store_true", help="smaller user counts and catalogs")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    suites = args.suite or SUITES
+    results = run_suites(suites, QUICK_PLAN if args.quick else FULL_PLAN)
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
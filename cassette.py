@@ -0,0 +1,316 @@
+"""
+Record-and-replay of the HTTP exchanges of a real run, for offline bug reproduction and
+CPU-per-request regression tests.
+
+Recording is a local proxy in front of the real server. Point any command at it; every
+request and its full response go into the cassette as they pass through:
+
+    python cassette.py record rush.cassette --port 8081
+    SHIEP_BASE_URL=http://127.0.0.1:8081 python main.py --start
+
+Replaying serves the cassette as the server, with the recorded latency of every response
+or, with --fast, as fast as possible:
+
+    python cassette.py replay rush.cassette --port 8081 [--fast]
+    SHIEP_BASE_URL=http://127.0.0.1:8081 python main.py --start
+
+The file is gzip-compressed JSON lines, one gzip member per flush, so a crash loses at most
+cassette_flush_interval seconds:
+
+    {"cassette": 1, "upstream": ..., "started": ...}   header
+    ["b", text]                                         next body index, counting from 0
+    ["x", offset, user, method, path, conditional, request body, status, headers, latency, response body]
+
+Bodies are written once and referred to by index, like the lesson ids of seat_recorder.py.
+Cookies are never written: the Cookie header is replaced by the short hash cookie_cache.py
+uses, and Set-Cookie is dropped.
+
+A replayed request is matched on method, path with query, form body and whether it was
+conditional (If-None-Match). Answers recorded for the same cookies come first, then those of
+any user, in recorded order; the last one is repeated once they run out, so a run that retries
+more often than the recorded one keeps getting the last answer.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import time
+from collections import deque
+
+import aiohttp
+from aiohttp import web
+
+from config import base_url, cassette_flush_interval
+from cookie_cache import fingerprint
+
+KEPT_HEADERS = ("Content-Type", "Location", "ETag", "Last-Modified")
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+SKIPPED_REQUEST_HEADERS = {"host", "content-length", "transfer-encoding", "accept-encoding"}
+
+
+class Exchange:
+    __slots__ = ("offset", "user", "method", "path", "conditional", "request_body", "status", "headers", "latency", "body")
+
+    def __init__(self, offset, user, method, path, conditional, request_body, status, headers, latency, body):
+        self.offset = offset
+        self.user = user  # Cookie hash, empty without cookies
+        self.method = method
+        self.path = path
+        self.conditional = conditional
+        self.request_body = request_body
+        self.status = status
+        self.headers = headers
+        self.latency = latency
+        self.body = body
+
+    def key(self) -> tuple:
+        return (self.method, self.path, self.conditional, self.request_body)
+
+
+def user_of(cookies) -> str:
+    return fingerprint(cookies) if cookies.get("JSESSIONID") else ""
+
+
+def is_conditional(headers) -> bool:
+    return any(name in headers for name in CONDITIONAL_HEADERS)
+
+
+def encode(text: bytes) -> str:
+    return text.decode("utf-8", "surrogateescape")  # Bytes that are not UTF-8 survive the round trip
+
+
+class CassetteWriter:
+    def __init__(self, path: str, upstream: str):
+        self.path = path
+        self.bodies: dict[str, int] = {}
+        self.buffer: list[str] = [json.dumps({"cassette": 1, "upstream": upstream, "started": time.time()})]
+        self.exchanges = 0
+        self.bytes = 0
+        open(path, "wb").close()
+
+    def body(self, text: str) -> int:
+        index = self.bodies.get(text)
+        if index is None:
+            index = self.bodies[text] = len(self.bodies)
+            self.buffer.append(json.dumps(["b", text], ensure_ascii=False))
+        return index
+
+    def add(self, exchange: Exchange):
+        request_body = self.body(exchange.request_body)
+        body = self.body(exchange.body)
+        self.buffer.append(
+            json.dumps(
+                [
+                    "x",
+                    round(exchange.offset, 4),
+                    exchange.user,
+                    exchange.method,
+                    exchange.path,
+                    exchange.conditional,
+                    request_body,
+                    exchange.status,
+                    exchange.headers,
+                    round(exchange.latency, 4),
+                    body,
+                ],
+                ensure_ascii=False,
+            )
+        )
+        self.exchanges += 1
+
+    def take(self) -> list[str]:
+        lines, self.buffer = self.buffer, []
+        return lines
+
+    def write(self, lines: list[str]):
+        """
+        Runs in a worker thread: appends the lines as one gzip member.
+        """
+        if not lines:
+            return
+        data = gzip.compress(("\n".join(lines) + "\n").encode("utf-8", "surrogateescape"), compresslevel=6)
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self.bytes += len(data)
+
+
+def read_cassette(path: str) -> tuple[dict, list[Exchange]]:
+    """
+    The header and exchanges of a cassette. A member cut short by a crash ends it.
+    """
+    header: dict = {}
+    bodies: list[str] = []
+    exchanges: list[Exchange] = []
+    with gzip.open(path, "rb") as f:
+        try:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                record = json.loads(raw.decode("utf-8", "surrogateescape"))
+                if isinstance(record, dict):
+                    header = record
+                elif record[0] == "b":
+                    bodies.append(record[1])
+                else:
+                    _, offset, user, method, path_qs, conditional, request_body, status, headers, latency, body = record
+                    exchanges.append(Exchange(offset, user, method, path_qs, conditional, bodies[request_body], status, headers, latency, bodies[body]))
+        except (EOFError, gzip.BadGzipFile):
+            pass
+    return header, exchanges
+
+
+class Recorder:
+    """
+    The recording proxy: forwards every request to the upstream server and writes the exchange.
+    """
+
+    def __init__(self, path: str, upstream: str):
+        self.upstream = upstream.rstrip("/")
+        self.writer = CassetteWriter(path, self.upstream)
+        self.started = time.monotonic()
+        self.session: aiohttp.ClientSession | None = None
+        self.flusher: asyncio.Task | None = None
+
+    async def forward(self, request: web.Request) -> web.Response:
+        arrived = time.monotonic()
+        request_body = await request.read()
+        local = f"{request.scheme}://{request.host}"
+        forwarded = {
+            name: value.replace(local, self.upstream) if name.lower() in ("origin", "referer") else value
+            for name, value in request.headers.items()
+            if name.lower() not in SKIPPED_REQUEST_HEADERS
+        }
+        try:
+            async with self.session.request(
+                request.method,
+                self.upstream + request.path_qs,
+                headers=forwarded,
+                data=request_body or None,
+                ssl=False,
+                allow_redirects=False,
+            ) as response:
+                body = await response.read()
+                headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+                set_cookies = response.headers.getall("Set-Cookie", [])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return web.Response(status=502, text=f"Upstream error: {e!r}")  # Not recorded: the client saw no answer from the server
+        self.writer.add(
+            Exchange(
+                offset=arrived - self.started,
+                user=user_of(request.cookies),
+                method=request.method,
+                path=request.path_qs,
+                conditional=is_conditional(request.headers),
+                request_body=encode(request_body),
+                status=response.status,
+                headers=headers,
+                latency=time.monotonic() - arrived,
+                body=encode(body),
+            )
+        )
+        reply = web.Response(status=response.status, body=body, headers=headers)
+        for cookie in set_cookies:
+            reply.headers.add("Set-Cookie", cookie)  # Passed on to the client, never written
+        return reply
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(cassette_flush_interval)
+            await asyncio.to_thread(self.writer.write, self.writer.take())
+
+    async def start(self, app: web.Application):
+        from http_pool import create_connector  # The same proxy settings as the scripts
+
+        self.session = aiohttp.ClientSession(connector=create_connector("Cassette"), cookie_jar=aiohttp.DummyCookieJar())
+        self.flusher = asyncio.create_task(self.run_flusher())
+
+    async def stop(self, app: web.Application):
+        self.flusher.cancel()
+        await self.session.close()
+        self.writer.write(self.writer.take())
+        print(f"Cassette: {self.writer.exchanges} exchange(s), {len(self.writer.bodies)} distinct bodies, {self.writer.bytes / 1024:.1f} KiB in {self.writer.path}.")
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=0)
+        app.router.add_route("*", "/{tail:.*}", self.forward)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+
+class Player:
+    """
+    Serves a cassette as the server. Answers recorded for the same cookies are preferred.
+    """
+
+    def __init__(self, exchanges: list[Exchange], fast: bool):
+        self.fast = fast
+        self.by_user: dict[tuple, deque[Exchange]] = {}
+        self.by_key: dict[tuple, deque[Exchange]] = {}
+        for exchange in exchanges:
+            self.by_user.setdefault((exchange.user, *exchange.key()), deque()).append(exchange)
+            self.by_key.setdefault(exchange.key(), deque()).append(exchange)
+        self.served = 0
+        self.missed = 0
+
+    def next(self, user: str, key: tuple) -> Exchange | None:
+        for answers in (self.by_user.get((user, *key)), self.by_key.get(key)):
+            if answers:
+                return answers.popleft() if len(answers) > 1 else answers[0]
+        return None
+
+    async def replay(self, request: web.Request) -> web.Response:
+        request_body = encode(await request.read())
+        key = (request.method, request.path_qs, is_conditional(request.headers), request_body)
+        exchange = self.next(user_of(request.cookies), key)
+        if exchange is None:
+            self.missed += 1
+            return web.Response(status=404, text=f"Not in cassette: {request.method} {request.path_qs}")
+        self.served += 1
+        if not self.fast and exchange.latency:
+            await asyncio.sleep(exchange.latency)
+        return web.Response(status=exchange.status, body=exchange.body.encode("utf-8", "surrogateescape"), headers=exchange.headers)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"served": self.served, "missed": self.missed})
+
+    async def stop(self, app: web.Application):
+        print(f"Cassette: {self.served} request(s) served, {self.missed} not in the cassette.")
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=0)
+        app.router.add_get("/cassette/stats", self.stats)
+        app.router.add_route("*", "/{tail:.*}", self.replay)
+        app.on_cleanup.append(self.stop)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the HTTP exchanges of a run into a cassette, or replay one.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="proxy to the server and write every exchange")
+    record.add_argument("path")
+    record.add_argument("--upstream", default=base_url, help="server to forward to (default: %(default)s)")
+    replay = commands.add_parser("replay", help="answer from the cassette")
+    replay.add_argument("path")
+    replay.add_argument("--fast", action="store_true", help="answer at once instead of with the recorded latency")
+    for command in (record, replay):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        app = Recorder(args.path, args.upstream).create_app()
+        print(f"Recording exchanges with {args.upstream} into {args.path}")
+    else:
+        header, exchanges = read_cassette(args.path)
+        app = Player(exchanges, args.fast).create_app()
+        duration = exchanges[-1].offset if exchanges else 0.0
+        print(f"Replaying {len(exchanges)} exchange(s) over {duration:.1f}s recorded from {header.get('upstream')}{' as fast as possible' if args.fast else ''}")
+    print(f"Point the scripts at it with SHIEP_BASE_URL=http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import json
+import sqlite3
+import time
+import zlib
+
+BUSY_TIMEOUT_MS = 5000  # How long a write waits for another process's write to finish
+
+
+class CacheEntry:
+    def __init__(self, courses: list, etag: str | None, last_modified: str | None, fetched_at: float, ttl: float):
+        self.courses = courses
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.fresh = time.time() - fetched_at < ttl
+
+    def conditional_headers(self) -> dict:
+        conditional = {}
+        if self.etag:
+            conditional["If-None-Match"] = self.etag
+        if self.last_modified:
+            conditional["If-Modified-Since"] = self.last_modified
+        return conditional
+
+
+class CatalogCache:
+    """
+    On-disk cache of stdElectCourse!data.action results, keyed by (semesterId, profileId).
+    Payloads are zlib-compressed JSON in SQLite; least recently used entries go first once
+    the total size passes max_bytes.
+    """
+
+    def __init__(self, path: str, semester_id: str, ttl: float, max_bytes: int):
+        self.semester_id = str(semester_id)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evicted = 0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")  # --workers processes read and write it at once
+        self.db.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS catalog (
+                semester_id TEXT NOT NULL,
+                profile_id TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (semester_id, profile_id)
+            )
+            """
+        )
+        self.db.commit()
+
+    def lookup(self, profile_id: str) -> CacheEntry | None:
+        row = self.db.execute(
+            "SELECT payload, etag, last_modified, fetched_at FROM catalog WHERE semester_id = ? AND profile_id = ?",
+            (self.semester_id, str(profile_id)),
+        ).fetchone()
+        if row is None:
+            return None
+        payload, etag, last_modified, fetched_at = row
+        try:
+            courses = json.loads(zlib.decompress(payload))
+        except (zlib.error, ValueError):
+            return None
+        entry = CacheEntry(courses, etag, last_modified, fetched_at, self.ttl)
+        if entry.fresh:
+            self.hits += 1
+            self._touch(profile_id, fetched_at=None)
+        return entry
+
+    def mark_revalidated(self, profile_id: str):
+        """
+        The server answered 304 Not Modified, so the entry counts as freshly fetched.
+        """
+        self.revalidated += 1
+        self._touch(profile_id, fetched_at=time.time())
+
+    def store(self, profile_id: str, courses: list, etag: str | None, last_modified: str | None):
+        self.misses += 1
+        now = time.time()
+        payload = zlib.compress(json.dumps(courses, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.db.execute(
+            "INSERT OR REPLACE INTO catalog VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.semester_id, str(profile_id), payload, etag, last_modified, now, now),
+        )
+        self._evict()
+        self.db.commit()
+
+    def _touch(self, profile_id: str, fetched_at: float | None):
+        now = time.time()
+        if fetched_at is None:
+            self.db.execute(
+                "UPDATE catalog SET accessed_at = ? WHERE semester_id = ? AND profile_id = ?",
+                (now, self.semester_id, str(profile_id)),
+            )
+        else:
+            self.db.execute(
+                "UPDATE catalog SET accessed_at = ?, fetched_at = ? WHERE semester_id = ? AND profile_id = ?",
+                (now, fetched_at, self.semester_id, str(profile_id)),
+            )
+        self.db.commit()
+
+    def _evict(self):
+        rows = self.db.execute("SELECT semester_id, profile_id, length(payload) FROM catalog ORDER BY accessed_at DESC").fetchall()
+        total = 0
+        for semester_id, profile_id, size in rows:
+            total += size
+            if total > self.max_bytes:
+                self.db.execute("DELETE FROM catalog WHERE semester_id = ? AND profile_id = ?", (semester_id, profile_id))
+                self.evicted += 1
+
+    def close(self):
+        self.db.close()
+
+    def print_stats(self):
+        print(
+            f"Catalog cache: {self.hits} hit(s), {self.revalidated} revalidated, "
+            f"{self.misses} miss(es), {self.evicted} evicted."
+        )
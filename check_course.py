@@ -1,14 +1,13 @@
 import asyncio
-import aiohttp
-from tqdm.asyncio import tqdm
+import time
 
+from config import check_watch_interval, seat_record_path
+from course_store import EnrollmentTable
 from inquire_course_info import get_enrollment_data
-from custom import USE_PROXY, proxies, USER_CONFIGS, INQUIRY_USER_DATA
-
-try:
-    from aiohttp_socks import ProxyConnector
-except ImportError:
-    ProxyConnector = None
+from custom import USER_CONFIGS, INQUIRY_USER_DATA
+from http_pool import SharedPool
+from metrics import METRICS
+from seat_recorder import open_recorder
 
 
 class CourseStatus:
@@ -18,64 +17,60 @@ class CourseStatus:
         self.success = success
 
 
-async def check(label: str, id: str, enrollments: dict):
-    sc = enrollments.get(id, {}).get("sc")
-    lc = enrollments.get(id, {}).get("lc")
-    if sc is None or lc is None:
-        return CourseStatus(label, id, False)
-    if sc < lc:
-        return CourseStatus(label, id, True)
-    else:
-        return CourseStatus(label, id, False)
-
-
-async def check_course():
-    connector = None
-    if USE_PROXY:
-        if ProxyConnector and "all" in proxies:
-            proxy_url_val = proxies["all"]
-            if proxy_url_val:
-                connector = ProxyConnector.from_url(proxy_url_val)
-            else:
-                print("Warning (Inquiry): USE_PROXY is True, but proxy URL is empty. No proxy.")
-        elif not ProxyConnector:
-            print("Warning (Inquiry): USE_PROXY is True, aiohttp-socks not installed. No proxy.")
-        else:
-            print("Warning (Inquiry): USE_PROXY is True, 'all' proxy key missing. No proxy.")
+def collect_targets() -> dict[str, list[str]]:
+    """
+    Course id -> labels of the users who want it, in USER_CONFIGS order.
+    """
+    targets: dict[str, list[str]] = {}
+    for user_config in USER_CONFIGS:
+        user_label = user_config.get("label", "Unknown_User")
+        for user_table in user_config.get("tables", []):
+            for course_id in user_table.get("course_ids", []):
+                labels = targets.setdefault(str(course_id), [])
+                if user_label not in labels:
+                    labels.append(user_label)
+    return targets
 
-    async with aiohttp.ClientSession(connector=connector) as session:
-        print("Fetching enrollment data...")
-        enrollments = await get_enrollment_data(session, INQUIRY_USER_DATA.get("cookies"))
-        if not enrollments:
-            print("Could not fetch enrollment data. Exiting inquiry.")
-            return
 
-        all_check_tasks = []
-        print("Collecting courses' id...")
+def open_courses(enrollments: dict, course_ids: list[str]) -> tuple[EnrollmentTable, set[str]]:
+    """
+    The numbers of the given courses only (not a table of the whole catalog) and the ones
+    with a free seat, in one pass over the ids.
+    """
+    table = EnrollmentTable({course_id: enrollments[course_id] for course_id in course_ids if course_id in enrollments})
+    return table, {course_id for course_id in course_ids if table.has_free_seat(course_id)}
+
 
-        for user_config in USER_CONFIGS:
-            user_label = user_config.get("label", "Unknown_User")
-            user_tables = user_config.get("tables", [])
-            for user_table in user_tables:
-                user_course_ids = user_table.get("course_ids", [])
-                for course_id in user_course_ids:
-                    all_check_tasks.append(
-                        check(
-                            label=user_label,
-                            id=course_id,
-                            enrollments=enrollments,
-                        )
-                    )
-
-        if not all_check_tasks:
+async def check_course(watch: bool = False):
+    async with SharedPool(owner_label="Check") as pool:
+        session = pool.session(INQUIRY_USER_DATA.get("label", "Unknown_User"))
+        cookies = INQUIRY_USER_DATA.get("cookies")
+
+        print("Collecting courses' id...")
+        targets = collect_targets()
+        if not targets:
             print("Cannot find any course to check.")
             return
 
-        print(f"Starting checking of all {len(all_check_tasks)} courses...\n")
-        results: list[CourseStatus] = await tqdm.gather(*all_check_tasks, desc="Overall Courses Checking Progress")
+        if watch:
+            await watch_courses(session, cookies, targets)
+            return
+
+        print("Fetching enrollment data...")
+        enrollments = await get_enrollment_data(session, cookies)
+        if not enrollments:
+            print("Could not fetch enrollment data. Exiting inquiry.")
+            return
+        _, available = open_courses(enrollments, list(targets))
+
+        results: list[CourseStatus] = []
+        for course_id, labels in targets.items():
+            for label in labels:
+                results.append(CourseStatus(label, course_id, course_id in available))
+                METRICS.count("check", "available" if course_id in available else "unavailable")
 
         print("\nAll courses checking tasks have been processed.")
-        await asyncio.sleep(0.1)
+        pool.print_stats()
 
         invalid_results: list[CourseStatus] = []
 
@@ -94,3 +89,72 @@ async def check_course():
                 print(f"[Unavailable] User: {peer.label} Course: {peer.id}")
 
         print()
+
+
+async def watch_courses(session, cookies: dict, targets: dict[str, list[str]]):
+    """
+    Polls queryStdCount every check_watch_interval seconds and prints only the courses that
+    opened or filled since the previous poll, with the time spent parsing and comparing.
+    Every snapshot of the whole catalog is appended to seat_record_path. Runs until interrupted.
+    """
+    course_ids = list(targets)
+    previous: set[str] | None = None
+    polls = 0
+    parse_total = 0.0
+    compare_total = 0.0
+    recorder = open_recorder(seat_record_path)
+    print(f"Watching {len(course_ids)} course(s) every {check_watch_interval}s. Press Ctrl+C to stop.")
+    try:
+        while True:
+            started = time.perf_counter()
+            cpu_started = time.thread_time()  # The body is parsed while it streams in; CPU time is the parse share
+            enrollments = await get_enrollment_data(session, cookies)
+            fetch_seconds = time.perf_counter() - started
+            parse_seconds = time.thread_time() - cpu_started
+            if not enrollments:
+                await asyncio.sleep(check_watch_interval)
+                continue
+
+            compare_started = time.perf_counter()
+            table, available = open_courses(enrollments, course_ids)
+            if previous is None:
+                opened, filled = [], []
+            else:
+                opened = sorted(available - previous)
+                filled = sorted(previous - available)
+            compare_seconds = time.perf_counter() - compare_started
+            if recorder:
+                recorder.record(enrollments)
+
+            polls += 1
+            parse_total += parse_seconds
+            compare_total += compare_seconds
+            stamp = time.strftime("%H:%M:%S")
+            if previous is None:
+                print(f"[{stamp}] {len(available)} of {len(course_ids)} course(s) have free seats.")
+                for course_id in sorted(available):
+                    print(f"[{stamp}]   OPEN   {course_id} ({describe(table, course_id)}) for {', '.join(targets[course_id])}")
+            for course_id in opened:
+                print(f"[{stamp}] OPENED {course_id} ({describe(table, course_id)}) for {', '.join(targets[course_id])}")
+            for course_id in filled:
+                print(f"[{stamp}] FILLED {course_id} ({describe(table, course_id)}) for {', '.join(targets[course_id])}")
+            if opened or filled:
+                print(
+                    f"[{stamp}] poll {polls}: fetch {fetch_seconds * 1000:.0f} ms, "
+                    f"parse {parse_seconds * 1000:.1f} ms CPU, compare {compare_seconds * 1000:.2f} ms"
+                )
+            previous = available
+            await asyncio.sleep(check_watch_interval)
+    finally:
+        if recorder:
+            recorder.close()
+        if polls:
+            print(
+                f"\nWatched {polls} poll(s): parse {parse_total / polls * 1000:.1f} ms CPU and "
+                f"compare {compare_total / polls * 1000:.2f} ms per poll on average."
+            )
+
+
+def describe(table: EnrollmentTable, course_id: str) -> str:
+    counts = table.get(course_id)
+    return "not in queryStdCount" if counts is None else f"{counts[0]}/{counts[1]}"
@@ -1,12 +1,20 @@
-url = "https://jw.shiep.edu.cn/eams/stdElectCourse!batchOperator.action"
+import os
+
+# Set SHIEP_BASE_URL to point every command at another server, e.g. mock_server.py
+base_url = os.environ.get("SHIEP_BASE_URL", "https://jw.shiep.edu.cn").rstrip("/")
+
+url = f"{base_url}/eams/stdElectCourse!batchOperator.action"
+course_data_url = f"{base_url}/eams/stdElectCourse!data.action"
+enrollment_url = f"{base_url}/eams/stdElectCourse!queryStdCount.action"
+check_url = f"{base_url}/eams/stdElectCourse.action"
 
 headers = {
     "Accept": "text/html, */*; q=0.01",
     "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
     "Connection": "keep-alive",
     "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
-    "Origin": "https://jw.shiep.edu.cn",
-    "Referer": "https://jw.shiep.edu.cn/eams/stdElectCourse!defaultPage.action",
+    "Origin": base_url,
+    "Referer": f"{base_url}/eams/stdElectCourse!defaultPage.action",
     "Sec-Fetch-Dest": "empty",
     "Sec-Fetch-Mode": "cors",
     "Sec-Fetch-Site": "same-origin",
@@ -25,3 +33,84 @@ data = {
 failed_words = ["上限", "已满", "已达", "已经达到", "冲突"]
 
 error_words = ["失败", "错误", "fail", "error", "503", "过快点击"]
+
+# Shared connection pool (see http_pool.py)
+pool_limit = 100  # Max open connections across all users, 0 means unlimited
+pool_limit_per_host = 0  # Max open connections to one host, 0 means unlimited
+dns_cache_ttl = 300  # Seconds a resolved address is cached
+keepalive_timeout = 60  # Seconds an idle connection is kept for reuse
+
+# USER_CONFIGS of --start (see task_plan.py): custom.py, or a .toml/.json file with the same layout.
+# With --endless the file is watched and added or removed courses and users are applied while running.
+task_plan_path = "custom.py"
+task_plan_poll_interval = 1.0  # Seconds between checks of the file's modification time
+
+# Write-ahead journal of task states for `--start --resume` (see journal.py)
+journal_path = "journal.jsonl"
+journal_flush_interval = 0.2  # Seconds between writes; each write is one fsync
+
+# Cookie validation (see verify_cookie_validity.py and cookie_cache.py)
+validation_concurrency = 20  # Checks of stdElectCourse.action in flight at once
+cookie_cache_path = "cookie_status.sqlite3"
+cookie_cache_ttl = 300  # Seconds a stored result is trusted when --start begins
+cookie_revalidate_interval = 60.0  # Seconds between background checks of every user during --start, 0 disables
+
+# Fresh cookies for users whose session expires during --start (see credentials.py)
+cookies_path = "cookies.json"
+cookies_poll_interval = 0.05  # Seconds between checks of the file
+cookie_wait_timeout = 30  # Seconds a user waits for new cookies after a 302 before giving up; --endless waits indefinitely
+
+seat_poll_interval = 1.0  # Seconds between queryStdCount polls in seat-driven mode
+check_watch_interval = 2.0  # Seconds between queryStdCount polls of `--check --watch`
+seat_record_path = "seats.seatrec"  # Snapshots of both polls are appended here (see seat_recorder.py), empty disables
+
+# Adaptive pacing per user and server node (see pacing.py)
+pacing_initial_interval = 0.2  # Seconds between attempts before anything is known about the server
+pacing_min_interval = 0.05
+pacing_max_interval = 5.0
+pacing_timeout_floor = 0.3  # Bounds of the request timeout, which follows twice the p99 latency in between
+pacing_timeout_ceiling = 5.0
+
+# Admission of batchOperator requests across all users (see request_scheduler.py), 0 means unlimited.
+# Off by default; e.g. 16 in flight and 50/s per node keep many accounts from swamping one node
+node_max_in_flight = 0  # Requests in flight to one SERVERNAME node
+node_max_rate = 0.0  # Requests started per second on one node
+total_max_in_flight = 0  # Requests in flight for the whole process
+total_max_rate = 0.0  # Requests started per second for the whole process
+
+# `--start --workers N` shards the users across N processes (see workers.py); the budgets above are split between them
+worker_report_interval = 1.0  # Seconds between metrics snapshots a worker sends to the parent
+
+# Courses of one profileId sent together as operator0..operatorN of one batchOperator request, 1 sends one per request.
+# If the server does not answer them course by course, --start goes back to one course per request.
+batch_size = 1
+
+# A batchOperator reply whose first this many bytes say "already selected" is not decoded further;
+# every other reply is classified on the whole body. 0 always decodes the whole body.
+response_prefix_bytes = 2048
+
+# On-disk cache of the lesson catalog (see catalog_cache.py)
+catalog_cache_path = "catalog_cache.sqlite3"
+catalog_cache_ttl = 6 * 3600  # Seconds before a cached catalog is revalidated with the server
+catalog_cache_max_bytes = 64 * 1024 * 1024
+
+inquiry_fetch_concurrency = 4  # profileIds fetched at the same time by --inquire and the pre-flight check
+
+# Check the configured courses against the cached catalog when --start begins (stale or missing catalogs are
+# fetched in the background) and drop the ones that cannot be selected; alternatives that clash are
+# cancelled once one of them is selected (see preflight.py)
+preflight_check = True
+
+# Event log of --start and --validate (see event_log.py)
+event_log_path = "events.jsonl"
+event_log_max_bytes = 16 * 1024 * 1024  # The file is rotated to events.jsonl.1, .2, ... past this size
+event_log_backups = 3
+event_log_flush_interval = 0.5  # Seconds between writes of the in-memory buffer
+console_log_level = "info"  # debug, info, warning or error; debug shows every attempt
+console_max_lines_per_second = 20  # Further events only go to the file, with a count on the console
+
+cassette_flush_interval = 1.0  # Seconds between writes of `python cassette.py record` (see cassette.py)
+
+metrics_port = 0  # Serve Prometheus metrics on http://127.0.0.1:<port>/metrics while a command runs, 0 disables
+
+startup_budget_ms = 600  # `python main.py --startup-report` fails when the imports of --start add more than this to a cold start (the bare interpreter is not counted)
@@ -0,0 +1,65 @@
+import hashlib
+import time
+
+
+def fingerprint(cookies: dict) -> str:
+    return hashlib.sha256(f"{cookies.get('JSESSIONID')}|{cookies.get('SERVERNAME')}".encode()).hexdigest()[:16]
+
+
+class CookieStatus:
+    def __init__(self, valid: bool, expired: bool, reason: str, checked_at: float):
+        self.valid = valid
+        self.expired = expired  # The server sent the session to the login page
+        self.reason = reason
+        self.checked_at = checked_at
+
+
+class CookieCache:
+    """
+    Last validation result per user label, in SQLite in WAL mode so --validate in another
+    terminal can write while --start reads. A result only applies to the cookies it was made
+    with: a short hash of JSESSIONID and SERVERNAME is stored, never the cookies themselves.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        import sqlite3  # Loaded when a cache is opened, not when --start is imported
+
+        self.ttl = ttl
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cookie_status (
+                label TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                valid INTEGER NOT NULL,
+                expired INTEGER NOT NULL,
+                reason TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.commit()
+
+    def lookup(self, label: str, cookies: dict) -> CookieStatus | None:
+        """
+        The stored result for these cookies, if it is younger than the ttl.
+        """
+        row = self.db.execute(
+            "SELECT valid, expired, reason, checked_at FROM cookie_status WHERE label = ? AND fingerprint = ?",
+            (label, fingerprint(cookies)),
+        ).fetchone()
+        if row is None or time.time() - row[3] >= self.ttl:
+            return None
+        valid, expired, reason, checked_at = row
+        return CookieStatus(bool(valid), bool(expired), reason, checked_at)
+
+    def store(self, label: str, cookies: dict, valid: bool, expired: bool, reason: str):
+        self.db.execute(
+            "INSERT OR REPLACE INTO cookie_status (label, fingerprint, valid, expired, reason, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (label, fingerprint(cookies), int(valid), int(expired), reason, time.time()),
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
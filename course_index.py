@@ -0,0 +1,187 @@
+import bisect
+import re
+from array import array
+from itertools import chain
+
+from course_store import CourseStore
+
+# Lesson codes and ids are nearly unique per lesson, so an n-gram index over them costs far more
+# to build than a scan over their distinct values costs per query
+TEXT_FIELDS = {"name": True, "teacher": True, "type": True, "no": False, "id": False}
+QUERY_TERM = re.compile(r"^([a-z_]+)\s*(>=|<=|!=|=|>|<)\s*(.*)$")
+
+
+def to_number(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grams(text: str) -> set[str]:
+    """
+    Every single character and every pair of adjacent characters of text.
+    """
+    return set(text) | {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class FieldIndex:
+    """
+    Inverted index over the distinct values of one text field. Catalogs repeat the same
+    teachers, types and names many times, so n-grams point at distinct values and each
+    value keeps the (sorted) ranks of the lessons that have it.
+    """
+
+    def __init__(self, use_grams: bool = True):
+        self.use_grams = use_grams
+        self.postings: dict[str, list[int]] = {}
+        self.gram_values: dict[str, set[str]] = {}
+
+    def add(self, value: str, rank: int):
+        postings = self.postings.get(value)
+        if postings is not None:
+            postings.append(rank)
+            return
+        self.postings[value] = [rank]
+        if self.use_grams:
+            for gram in grams(value):
+                self.gram_values.setdefault(gram, set()).add(value)
+
+    def match(self, needle: str) -> list[int]:
+        """
+        Ranks of lessons whose value contains needle, in rank order.
+        """
+        if self.use_grams:
+            needle_grams = {needle[i : i + 2] for i in range(len(needle) - 1)} or {needle}
+            candidates = sorted((self.gram_values.get(gram, set()) for gram in needle_grams), key=len)
+            values = candidates[0].intersection(*candidates[1:])
+        else:
+            values = self.postings
+        values = [value for value in values if needle in value]
+        if len(values) == 1:
+            return self.postings[values[0]]
+        return sorted(chain.from_iterable(self.postings[value] for value in values))
+
+
+class NumericIndex:
+    def __init__(self, values: list[float | None]):
+        self.values = values
+        pairs = sorted((value, rank) for rank, value in enumerate(values) if value is not None)
+        self.keys = [value for value, _ in pairs]
+        self.ranks = [rank for _, rank in pairs]
+
+    def match(self, op: str, number: float) -> list[int]:
+        match op:
+            case "=":
+                low, high = bisect.bisect_left(self.keys, number), bisect.bisect_right(self.keys, number)
+            case ">":
+                low, high = bisect.bisect_right(self.keys, number), len(self.keys)
+            case ">=":
+                low, high = bisect.bisect_left(self.keys, number), len(self.keys)
+            case "<":
+                low, high = 0, bisect.bisect_left(self.keys, number)
+            case "<=":
+                low, high = 0, bisect.bisect_right(self.keys, number)
+            case _:
+                return sorted(rank for rank, value in enumerate(self.values) if value is not None and value != number)
+        return sorted(self.ranks[low:high])
+
+    def test(self, rank: int, op: str, number: float) -> bool:
+        value = self.values[rank]
+        if value is None:
+            return False
+        match op:
+            case "=":
+                return value == number
+            case ">":
+                return value > number
+            case ">=":
+                return value >= number
+            case "<":
+                return value < number
+            case "<=":
+                return value <= number
+            case _:
+                return value != number
+
+
+class CourseIndex:
+    """
+    Built once over a CourseStore. Lessons are ranked in display order (type, -credits, id),
+    so every posting list is already sorted and results never need re-sorting.
+
+    Queries are whitespace-separated terms that must all match:
+        高等数学                  name contains 高等数学
+        teacher=王 type=必修      substring match on text fields
+        credits>=3 free>0        comparisons on credits and free seats (limit - enrolled)
+    """
+
+    def __init__(self, store: CourseStore):
+        self.store = store
+        credits = [to_number(store.credit_value(row)) for row in range(len(store))]
+        self.order = array("i", sorted(range(len(store)), key=lambda row: (store.type[row], -(credits[row] or 0), store.ids[row])))
+
+        columns = {"name": store.name, "teacher": store.teacher, "type": store.type, "no": store.no, "id": store.ids}
+        self.fields: dict[str, FieldIndex] = {field: FieldIndex(use_grams) for field, use_grams in TEXT_FIELDS.items()}
+        for field, field_index in self.fields.items():
+            column = columns[field]
+            for rank, row in enumerate(self.order):
+                field_index.add(str(column[row]).lower(), rank)
+
+        self.numeric: dict[str, NumericIndex] = {"credits": NumericIndex([credits[row] for row in self.order])}
+        self.refresh_enrollments()
+
+    def refresh_enrollments(self):
+        """
+        Rebuilds the free-seat index after the store got fresh queryStdCount data.
+        """
+        enrollments, ids = self.store.enrollments, self.store.ids
+        self.numeric["free"] = NumericIndex([enrollments.free(ids[row]) for row in self.order])
+
+    def parse(self, query: str) -> list[tuple[str, str, str]]:
+        terms = []
+        for token in query.strip().lower().split():
+            match = QUERY_TERM.match(token)
+            if match:
+                terms.append(match.groups())
+            else:
+                terms.append(("name", "=", token))
+        return terms
+
+    def search_ranks(self, query: str) -> list[int]:
+        text_matches: list[list[int]] = []
+        numeric_terms: list[tuple[NumericIndex, str, float]] = []
+        scan_terms: list[tuple[str, str]] = []
+
+        for key, op, value in self.parse(query):
+            if key in self.numeric and to_number(value) is not None:
+                numeric_terms.append((self.numeric[key], op, to_number(value)))
+            elif key in self.fields and op == "=":
+                text_matches.append(self.fields[key].match(value) if value else list(range(len(self.order))))
+            else:
+                scan_terms.append((key, value))  # Columns without an index, e.g. enrolled or limit
+
+        if text_matches:
+            text_matches.sort(key=len)
+            ranks = text_matches[0]
+            for other in text_matches[1:]:
+                other_set = set(other)
+                ranks = [rank for rank in ranks if rank in other_set]
+        elif numeric_terms:
+            numeric_index, op, number = numeric_terms.pop(0)
+            ranks = numeric_index.match(op, number)
+        else:
+            ranks = range(len(self.order))
+
+        for numeric_index, op, number in numeric_terms:
+            ranks = [rank for rank in ranks if numeric_index.test(rank, op, number)]
+        for key, value in scan_terms:
+            ranks = [rank for rank in ranks if value in str(self.store.row(self.order[rank]).get(key, "")).lower()]
+        return list(ranks)
+
+    def search(self, query: str) -> list[int]:
+        """
+        Store rows of the matching lessons in (type, -credits, id) order.
+        """
+        order = self.order
+        return [order[rank] for rank in self.search_ranks(query)]
@@ -0,0 +1,188 @@
+"""
+Parser for the JavaScript object literals EAMS returns instead of JSON, e.g.
+
+    var lessonJSONs = [{id:1,name:'Director\\'s Seminar',teachers:'王老师',},];
+    window.lessonId2Counts={'1':{sc:10,lc:30}}
+
+Single-quoted strings, unquoted keys and trailing commas are rewritten into JSON in one scan,
+which the C json decoder then parses. Text between tokens (numbers, brackets, true/false)
+is copied as is. The scan can run chunk by chunk while the response is still arriving.
+
+Chunks without backslashes or double quotes (nearly all of a real catalog) take a fast path:
+splitting on ' separates strings from structure, so keys and commas are fixed with plain
+C-level regex substitutions on the string-free skeleton. Everything else goes through TOKEN.
+"""
+
+import codecs
+import json
+import re
+
+TOKEN = re.compile(
+    r"""
+    (?P<single>'(?:[^'\\]|\\.)*')
+    |(?P<double>"(?:[^"\\]|\\.)*")
+    |(?P<open>['"])
+    |(?P<key>[A-Za-z_$][\w$]*)(?=\s*:)
+    |(?P<comma>,)(?=\s*[\]}])
+    |(?P<tail>(?:[A-Za-z_$][\w$]*|,)\s*\Z)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+SKELETON_KEY = re.compile(r"(?<![\w$\"])([A-Za-z_$][\w$]*)(\s*:)")
+SAMPLE_KEY = re.compile(r"([{,])([A-Za-z_$][\w$]*):")
+KEY_SAMPLE_CHARS = 65536
+SKELETON_COMMA = re.compile(r",(?=\s*[\]}])")
+SENTINEL = "\x00"
+
+ESCAPE = re.compile(r"""\\(x[0-9A-Fa-f]{2}|.)|\"""", re.DOTALL)
+
+CLOSERS = {"[": "]", "{": "}"}
+
+
+def _escape_replacement(match: re.Match) -> str:
+    escaped = match.group(1)
+    if escaped is None:
+        return '\\"'  # a bare double quote inside a single-quoted string
+    if escaped == "'":
+        return "'"
+    if escaped[0] == "x":
+        return "\\u00" + escaped[1:]
+    if escaped in "\"\\/bfnrtu":
+        return "\\" + escaped
+    return escaped  # JS drops the backslash of unknown escapes
+
+
+def string_to_json(token: str) -> str:
+    """
+    A single- or double-quoted JS string token as a JSON string, escape by escape.
+    """
+    inner = token[1:-1]
+    if "\\" not in inner and '"' not in inner:
+        return '"' + inner + '"'
+    return '"' + ESCAPE.sub(_escape_replacement, inner) + '"'
+
+
+def quote_keys(skeleton: str) -> str:
+    """
+    A catalog repeats the same few keys for every lesson, so quote the keys seen in a sample
+    with str.replace and leave only the leftovers (if any) to the per-match regex.
+    """
+    for opener, key in set(SAMPLE_KEY.findall(skeleton, 0, KEY_SAMPLE_CHARS)):
+        skeleton = skeleton.replace(opener + key + ":", opener + '"' + key + '":')
+    if SKELETON_KEY.search(skeleton):
+        skeleton = SKELETON_KEY.sub(r'"\1"\2', skeleton)
+    return skeleton
+
+
+def quote_simple(text: str) -> str:
+    """
+    Fast path for text with no backslash, double quote or NUL, starting outside any string.
+    """
+    pieces = text.split("'")
+    if len(pieces) % 2 == 0:
+        raise ValueError("Unterminated string in course data")
+    skeleton = quote_keys(SENTINEL.join(pieces[0::2]))
+    if SKELETON_COMMA.search(skeleton):
+        skeleton = SKELETON_COMMA.sub("", skeleton)
+    pieces[0::2] = skeleton.split(SENTINEL)
+    return '"'.join(pieces)
+
+
+def safe_cut(buffer: str) -> int:
+    """
+    Position just after the last } that is outside any string, or 0 if there is none yet.
+    """
+    cut = buffer.rfind("}")
+    while cut != -1 and buffer.count("'", 0, cut) % 2:
+        cut = buffer.rfind("}", 0, cut)
+    return cut + 1
+
+
+class LiteralParser:
+    """
+    Incremental JS-literal to Python parser. Call feed() with text chunks, then close().
+    Everything before the first `start` character (e.g. "var lessonJSONs = ") and after
+    its matching last closer is ignored.
+    """
+
+    def __init__(self, start: str = "["):
+        self.start = start
+        self.closer = CLOSERS[start]
+        self.started = False
+        self.buffer = ""
+        self.parts: list[str] = []
+
+    def feed(self, chunk: str):
+        if not self.started:
+            index = chunk.find(self.start)
+            if index == -1:
+                return
+            self.started = True
+            chunk = chunk[index:]
+        self.buffer += chunk
+        self._translate(final=False)
+
+    def _translate(self, final: bool):
+        buffer = self.buffer
+        if "\\" in buffer or '"' in buffer or SENTINEL in buffer:
+            self._translate_tokens(final)
+            return
+        cut = len(buffer) if final else safe_cut(buffer)
+        if cut:
+            self.parts.append(quote_simple(buffer[:cut]))
+            self.buffer = buffer[cut:]
+
+    def _translate_tokens(self, final: bool):
+        buffer = self.buffer
+        parts = self.parts
+        position = 0
+        for match in TOKEN.finditer(buffer):
+            kind = match.lastgroup
+            if kind in ("open", "tail"):
+                if not final:
+                    break  # May be cut in half, wait for the next chunk
+                if kind == "open":
+                    raise ValueError(f"Unterminated string at: {buffer[match.start():match.start() + 40]!r}")
+                parts.append(buffer[position:match.end()])
+                position = match.end()
+                continue
+            parts.append(buffer[position:match.start()])
+            if kind in ("single", "double"):
+                parts.append(string_to_json(match.group()))
+            elif kind == "key":
+                parts.append('"' + match.group() + '"')
+            # A trailing comma is simply dropped
+            position = match.end()
+        else:
+            parts.append(buffer[position:])
+            position = len(buffer)
+        self.buffer = buffer[position:]
+
+    def close(self):
+        if not self.started:
+            raise ValueError(f"No {self.start!r} found in response")
+        self._translate(final=True)
+        text = "".join(self.parts)
+        end = text.rfind(self.closer)
+        if end == -1:
+            raise ValueError(f"No closing {self.closer!r} found in response")
+        return json.loads(text[: end + 1], strict=False)
+
+
+def parse_js_literal(text: str, start: str = "["):
+    parser = LiteralParser(start)
+    parser.feed(text)
+    return parser.close()
+
+
+async def parse_js_literal_stream(content, start: str = "[", encoding: str = "utf-8", chunk_size: int = 65536):
+    """
+    Parses straight from an aiohttp StreamReader, translating each chunk as it arrives.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    parser = LiteralParser(start)
+    async for chunk in content.iter_chunked(chunk_size):
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    return parser.close()
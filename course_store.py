@@ -0,0 +1,115 @@
+import math
+import sys
+from array import array
+
+
+class EnrollmentTable:
+    """
+    queryStdCount numbers as two integer arrays, with one dict from lesson id to slot.
+    -1 marks a count the server did not send.
+    """
+
+    def __init__(self, counts: dict):
+        self.slots: dict[str, int] = {}
+        self.sc = array("i")
+        self.lc = array("i")
+        for lesson_id, item in counts.items():
+            self.slots[sys.intern(str(lesson_id))] = len(self.sc)
+            sc, lc = item.get("sc"), item.get("lc")
+            self.sc.append(-1 if sc is None else sc)
+            self.lc.append(-1 if lc is None else lc)
+
+    def __len__(self):
+        return len(self.sc)
+
+    def get(self, lesson_id: str) -> tuple[int, int] | None:
+        """
+        (enrolled, limit) for a lesson, or None if either number is unknown.
+        """
+        slot = self.slots.get(str(lesson_id))
+        if slot is None or self.sc[slot] < 0 or self.lc[slot] < 0:
+            return None
+        return self.sc[slot], self.lc[slot]
+
+    def free(self, lesson_id: str) -> int | None:
+        counts = self.get(lesson_id)
+        return None if counts is None else counts[1] - counts[0]
+
+    def has_free_seat(self, lesson_id: str) -> bool:
+        counts = self.get(lesson_id)
+        return counts is not None and counts[0] < counts[1]
+
+
+class CourseStore:
+    """
+    The lesson catalog as columns: integer ids and float credits in arrays, text fields in
+    lists of interned strings (teachers, types and names repeat across thousands of lessons).
+    Lessons are de-duplicated by id as they are added.
+    """
+
+    def __init__(self):
+        self.rows_by_id: dict[str, int] = {}
+        self.ids = array("q")
+        self.credits = array("d")
+        self.no: list[str] = []
+        self.name: list[str] = []
+        self.type: list[str] = []
+        self.teacher: list[str] = []
+        self.enrollments = EnrollmentTable({})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, course: dict) -> bool:
+        """
+        Adds one lesson as parsed from stdElectCourse!data.action. Returns False for a duplicate.
+        """
+        key = sys.intern(str(course.get("id", "")))
+        if key in self.rows_by_id:
+            return False
+        try:
+            lesson_id = int(key)
+        except ValueError:
+            return False
+        try:
+            credits = float(course.get("credits", ""))
+        except (TypeError, ValueError):
+            credits = math.nan
+
+        self.rows_by_id[key] = len(self.ids)
+        self.ids.append(lesson_id)
+        self.credits.append(credits)
+        self.no.append(sys.intern(str(course.get("no", ""))))
+        self.name.append(sys.intern(str(course.get("name", ""))))
+        self.type.append(sys.intern(str(course.get("courseTypeName", ""))))
+        self.teacher.append(sys.intern(str(course.get("teachers", ""))))
+        return True
+
+    def add_all(self, courses: list[dict]) -> int:
+        return sum(1 for course in courses if self.add(course))
+
+    def find(self, lesson_id: str) -> int | None:
+        return self.rows_by_id.get(str(lesson_id))
+
+    def set_enrollments(self, enrollments: EnrollmentTable):
+        self.enrollments = enrollments
+
+    def credit_value(self, row: int):
+        credits = self.credits[row]
+        return "" if math.isnan(credits) else credits
+
+    def row(self, row: int) -> dict:
+        """
+        One lesson as a display/CSV record. Built on demand, the store keeps no dicts.
+        """
+        counts = self.enrollments.get(self.ids[row])
+        return {
+            "id": self.ids[row],
+            "no": self.no[row],
+            "name": self.name[row],
+            "credits": self.credit_value(row),
+            "type": self.type[row],
+            "teacher": self.teacher[row],
+            "enrolled": "N/A" if counts is None else counts[0],
+            "limit": "N/A" if counts is None else counts[1],
+        }
@@ -0,0 +1,34 @@
+"""
+Fresh cookies for a running --start.
+
+When a user's session expires (302), only that user's loop is parked until new cookies for
+its label are written to the credentials file (cookies_path in config.py):
+
+    {"User_Alice": {"JSESSIONID": "...", "SERVERNAME": "c1"}}
+
+The file is polled every cookies_poll_interval seconds. Write it to a temporary file and rename
+it over the old one, so a half-written file is never read.
+"""
+
+import json
+
+from file_watch import watch_file
+
+
+def read_credentials(path: str) -> dict[str, dict]:
+    with open(path, encoding="utf-8") as f:
+        credentials = json.load(f)
+    if not isinstance(credentials, dict):
+        raise ValueError("expected an object of label -> cookies")
+    return {
+        str(label): cookies
+        for label, cookies in credentials.items()
+        if isinstance(cookies, dict) and cookies.get("JSESSIONID")
+    }
+
+
+async def watch_credentials(path: str, on_change, interval: float):
+    """
+    Calls on_change(credentials) every time the file changes.
+    """
+    await watch_file(path, interval, read_credentials, on_change)
@@ -0,0 +1,211 @@
+"""
+Structured events for the selection and validation loops.
+
+emit() only appends a record to an in-memory buffer; a background task writes the buffer
+to a JSONL file (rotated by size) from a worker thread. Events at or above the console level
+are shown through tqdm.write, at most console_max_lines_per_second lines per second; the rest
+are counted and only reach the file.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from enum import IntEnum, StrEnum
+
+from tqdm import tqdm
+
+from config import (
+    event_log_path,
+    event_log_max_bytes,
+    event_log_backups,
+    event_log_flush_interval,
+    console_log_level,
+    console_max_lines_per_second,
+)
+
+
+class Level(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
+
+class Event(StrEnum):
+    # Selection
+    USER_STARTED = "user-started"
+    USER_FINISHED = "user-finished"
+    PLAN_RELOADED = "plan-reloaded"
+    NO_TASKS = "no-tasks"
+    SELECTED = "selected"
+    ALREADY_SELECTED = "already-selected"
+    REJECTED = "rejected"
+    RETRYABLE = "retryable"
+    UNCLEAR = "unclear"
+    REDIRECTED = "redirected"
+    BATCH_REJECTED = "batch-rejected"
+    PARKED = "parked"
+    RESUMED = "resumed"
+    HTTP_STATUS = "http-status"
+    TIMEOUT = "timeout"
+    NETWORK_ERROR = "network-error"
+    EXCEPTION = "exception"
+    GAVE_UP = "gave-up"
+    DROPPED = "dropped"
+    SUPERSEDED = "superseded"
+    # Validation
+    COOKIE_VALID = "cookie-valid"
+    COOKIE_INVALID = "cookie-invalid"
+
+
+# Level and console line of every event. Lines are formatted only when they are shown.
+EVENT_FORMATS: dict[Event, tuple[Level, str]] = {
+    Event.USER_STARTED: (Level.INFO, "Starting selection for {tasks} course(s) for user {user}..."),
+    Event.USER_FINISHED: (Level.INFO, "User {user} - Course selection processes has concluded."),
+    Event.PLAN_RELOADED: (Level.INFO, "Task plan reloaded: {users_added} user(s) added, {users_removed} removed; {tasks_added} course(s) added, {tasks_removed} removed."),
+    Event.NO_TASKS: (Level.WARNING, "No valid tasks found for user: {user}. Exiting selection process."),
+    Event.SELECTED: (Level.INFO, "User {user} ({profile}) - Course ID {course}: Selection Succeeded!"),
+    Event.ALREADY_SELECTED: (Level.INFO, "User {user} ({profile}) - Course ID {course}: Already selected."),
+    Event.REJECTED: (Level.INFO, "User {user} ({profile}) - Course ID {course}: Failed (reason: {word})."),
+    Event.RETRYABLE: (Level.DEBUG, "User {user} ({profile}) - Course ID {course}: Failed (error: {word})."),
+    Event.UNCLEAR: (Level.DEBUG, "User {user} ({profile}) - Course ID {course}: 200 OK, outcome unclear (empty response)."),
+    Event.REDIRECTED: (Level.WARNING, "User {user} ({profile}) - Course ID {course}: Status 302 redirecting to {location}. Please check your cookies!!!"),
+    Event.BATCH_REJECTED: (Level.WARNING, "User {user} ({profile}) - Courses {course}: Batch request not accepted ({reason}), sending one course per request from now on."),
+    Event.PARKED: (Level.WARNING, "User {user} - Session expired, {tasks} course(s) parked until new cookies for {user} are written to {path}."),
+    Event.RESUMED: (Level.INFO, "User {user} - New cookies received after {waited:.1f}s, resuming {tasks} course(s)."),
+    Event.HTTP_STATUS: (Level.DEBUG, "User {user} ({profile}) - Course ID {course}: Non-200 Status {status} (response: {body})."),
+    Event.TIMEOUT: (Level.DEBUG, "User {user} ({profile}) - Course ID {course}: Request timed out."),
+    Event.NETWORK_ERROR: (Level.DEBUG, "User {user} ({profile}) - Course ID {course}: Network ClientError: {error}"),
+    Event.EXCEPTION: (Level.ERROR, "User {user} ({profile}) - Course ID {course}: Exception: {error}"),
+    Event.GAVE_UP: (Level.WARNING, "Failed completely - ({profile}, {course}) of {user}"),
+    Event.DROPPED: (Level.WARNING, "User {user} ({profile}) - Course ID {course}: Not sent, {reason}."),
+    Event.SUPERSEDED: (Level.INFO, "User {user} ({profile}) - Course ID {course}: Cancelled, clashes with the selected course {selected}."),
+    Event.COOKIE_VALID: (Level.DEBUG, "[VALID] User: {user}"),
+    Event.COOKIE_INVALID: (Level.INFO, "[INVALID] User: {user} ({reason})"),
+}
+
+
+class EventLog:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        backups: int,
+        flush_interval: float,
+        console_level: str,
+        console_rate: int,
+        max_buffer: int = 100_000,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.console_level = Level[console_level.upper()]
+        self.console_rate = console_rate
+        self.max_buffer = max_buffer
+
+        self.buffer: deque[dict] = deque()
+        self.writer: asyncio.Task | None = None
+        self.stopping: asyncio.Event | None = None
+        self.written = 0
+        self.dropped = 0
+        self.hidden = 0  # Console lines held back by the rate limit
+        self.window_start = 0.0
+        self.window_lines = 0
+        self.window_hidden = 0
+
+    async def __aenter__(self):
+        if self.writer is None:
+            self.stopping = asyncio.Event()
+            self.writer = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        self.print_stats()
+
+    def emit(self, event: Event, **fields):
+        if len(self.buffer) < self.max_buffer:
+            self.buffer.append({"ts": time.time(), "event": event.value, **fields})
+        else:
+            self.dropped += 1
+        level, line = EVENT_FORMATS[event]
+        if level >= self.console_level:
+            self.show(line, fields)
+
+    def show(self, line: str, fields: dict):
+        now = time.monotonic()
+        if now - self.window_start >= 1:
+            if self.window_hidden:
+                tqdm.write(f"... {self.window_hidden} more event(s) not shown, see {self.path}")
+            self.window_start = now
+            self.window_lines = 0
+            self.window_hidden = 0
+        if self.window_lines < self.console_rate:
+            self.window_lines += 1
+            tqdm.write(line.format(**fields))
+        else:
+            self.window_hidden += 1
+            self.hidden += 1
+
+    async def run(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        batch = list(self.buffer)
+        self.buffer.clear()
+        await asyncio.to_thread(self.write, batch)
+        self.written += len(batch)
+
+    def write(self, batch: list[dict]):
+        """
+        Runs in a worker thread: serializes the batch and appends it, rotating the file first if needed.
+        """
+        text = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch).encode("utf-8")
+        if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + len(text) > self.max_bytes:
+            self.rotate()
+        with open(self.path, "ab") as f:
+            f.write(text)
+
+    def rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    async def close(self):
+        if self.writer:
+            self.stopping.set()
+            await self.writer  # Its last round flushes whatever is left
+            self.writer = None
+        else:
+            await self.flush()
+        if self.window_hidden:
+            tqdm.write(f"... {self.window_hidden} more event(s) not shown, see {self.path}")
+            self.window_hidden = 0
+
+    def print_stats(self):
+        dropped = f", {self.dropped} dropped (buffer full)" if self.dropped else ""
+        print(f"Event log: {self.written} event(s) written to {self.path}, {self.hidden} not shown on console{dropped}.")
+
+
+EVENTS = EventLog(
+    path=event_log_path,
+    max_bytes=event_log_max_bytes,
+    backups=event_log_backups,
+    flush_interval=event_log_flush_interval,
+    console_level=console_log_level,
+    console_rate=console_max_lines_per_second,
+)
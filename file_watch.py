@@ -0,0 +1,29 @@
+import asyncio
+import os
+
+
+async def watch_file(path: str, interval: float, read, on_change):
+    """
+    Polls the file's mtime every interval seconds and calls on_change(read(path)) after each
+    change, including the file appearing. A file that cannot be read or parsed is reported and
+    skipped until it changes again. Runs until cancelled.
+    """
+    try:
+        last_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        last_mtime = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        if mtime == last_mtime:
+            continue
+        last_mtime = mtime
+        try:
+            content = read(path)
+        except Exception as e:
+            print(f"Could not read {path}, ignoring this change ({e!r}).")
+            continue
+        on_change(content)
@@ -0,0 +1,96 @@
+import aiohttp
+
+from config import pool_limit, pool_limit_per_host, dns_cache_ttl, keepalive_timeout
+from custom import USE_PROXY, proxies
+
+
+class PoolStats:
+    def __init__(self):
+        self.created = 0
+        self.reused = 0
+
+
+def create_connector(owner_label: str) -> aiohttp.BaseConnector:
+    """
+    Builds the one connector every session shares, going through the proxy if configured.
+    """
+    connector_kwargs = {
+        "limit": pool_limit,
+        "limit_per_host": pool_limit_per_host,
+        "ttl_dns_cache": dns_cache_ttl,
+        "keepalive_timeout": keepalive_timeout,
+    }
+
+    if USE_PROXY:
+        try:
+            from aiohttp_socks import ProxyConnector  # Optional, only needed behind a SOCKS/HTTP proxy
+        except ImportError:
+            ProxyConnector = None
+
+        if ProxyConnector and "all" in proxies:
+            proxy_url_val = proxies["all"]
+            if proxy_url_val:
+                return ProxyConnector.from_url(proxy_url_val, **connector_kwargs)
+            print(f"Warning ({owner_label}): USE_PROXY is True, but proxy URL is empty. No proxy.")
+        elif not ProxyConnector:
+            print(f"Warning ({owner_label}): USE_PROXY is True, but aiohttp-socks not installed. No proxy.")
+        else:
+            print(f"Warning ({owner_label}): USE_PROXY is True, but 'all' proxy key missing. No proxy.")
+
+    return aiohttp.TCPConnector(**connector_kwargs)
+
+
+class SharedPool:
+    """
+    One keep-alive connection pool for the whole process.
+    Each user label gets its own session (and cookie jar) on top of the shared connector.
+    """
+
+    def __init__(self, owner_label: str = "Pool"):
+        self.owner_label = owner_label
+        self.stats = PoolStats()
+        self.connector: aiohttp.BaseConnector | None = None
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_connection_create_end.append(self._on_connection_create)
+        self.trace_config.on_connection_reuseconn.append(self._on_connection_reuse)
+
+    async def _on_connection_create(self, session, trace_config_ctx, params):
+        self.stats.created += 1
+
+    async def _on_connection_reuse(self, session, trace_config_ctx, params):
+        self.stats.reused += 1
+
+    async def __aenter__(self):
+        self.connector = create_connector(self.owner_label)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def session(self, label: str) -> aiohttp.ClientSession:
+        """
+        Returns the session for a user label, creating it on first use.
+        """
+        session = self.sessions.get(label)
+        if session is None:
+            session = aiohttp.ClientSession(
+                connector=self.connector,
+                connector_owner=False,
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                trace_configs=[self.trace_config],
+            )
+            self.sessions[label] = session
+        return session
+
+    async def close(self):
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions.clear()
+        if self.connector is not None:
+            await self.connector.close()
+            self.connector = None
+
+    def print_stats(self):
+        print(f"Connection pool: {self.stats.created} opened, {self.stats.reused} reused.")
@@ -0,0 +1,135 @@
+"""
+Write-ahead journal of --start (journal_path in config.py).
+
+Every state change of a task is appended as one JSON line: queued, selected, gave-up or
+removed. Records are buffered and written with one fsync per journal_flush_interval, so a
+crash loses at most that window (a course selected in it is answered "already selected"
+when it is sent again). `--start --resume` replays the file: courses already selected are
+skipped and everything else is queued again. The file is then compacted to one record per
+task. Attempts themselves are not journaled (they are in the event log), so its size follows
+the number of tasks, not of attempts. Without --resume the journal starts over.
+"""
+
+import asyncio
+import json
+import os
+import time
+from enum import StrEnum
+
+from config import journal_path, journal_flush_interval
+from task_plan import Task
+
+
+class TaskState(StrEnum):
+    QUEUED = "queued"
+    SELECTED = "selected"
+    GAVE_UP = "gave-up"
+    REMOVED = "removed"
+    SUPERSEDED = "superseded"  # A clashing alternative was selected (see preflight.py)
+
+
+def replay(path: str) -> dict[Task, TaskState]:
+    """
+    Last state of every task in the journal. A torn last line from a crash is ignored.
+    """
+    with open(path, "rb") as f:
+        lines = f.read().splitlines()
+    if lines and not lines[-1].endswith(b"]"):
+        lines.pop()  # Torn by a crash in the middle of a write
+    try:
+        records = json.loads(b"[" + b",".join(lines) + b"]")  # One C-level parse for the whole file
+    except ValueError:
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    last = {(user, profile_id, course_id): state for _, user, profile_id, course_id, state in records}
+    return {Task(*key): TaskState(state) for key, state in last.items()}
+
+
+def compact(path: str, states: dict[Task, TaskState]):
+    """
+    Rewrites the journal as one record per task, so it does not grow from one resume to the next.
+    """
+    now = round(time.time(), 3)
+    lines = [json.dumps([now, *task, state.value], ensure_ascii=False) + "\n" for task, state in states.items() if state is not TaskState.REMOVED]
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+class Journal:
+    def __init__(self, path: str, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer: list[bytes] = []
+        self.file = None
+        self.writer: asyncio.Task | None = None
+        self.stopping: asyncio.Event | None = None
+        self.written = 0
+        self.syncs = 0
+
+    async def open(self, resume: bool) -> dict[Task, TaskState]:
+        """
+        Starts the journal and returns the replayed states (empty unless resuming).
+        """
+        states = {}
+        if resume:
+            if os.path.exists(self.path):
+                start = time.perf_counter()
+                states = await asyncio.to_thread(replay, self.path)
+                await asyncio.to_thread(compact, self.path, states)
+                selected = sum(state is TaskState.SELECTED for state in states.values())
+                print(f"Resuming from {self.path}: {selected} course(s) already selected are skipped ({time.perf_counter() - start:.2f}s to replay and compact).")
+            else:
+                print(f"No journal at {self.path}, starting from scratch.")
+        self.file = open(self.path, "ab" if resume else "wb")
+        self.stopping = asyncio.Event()
+        self.writer = asyncio.create_task(self.run())
+        return states
+
+    def record(self, task: Task, state: TaskState):
+        if self.file is not None:
+            self.buffer.append(json.dumps([round(time.time(), 3), *task, state.value], ensure_ascii=False).encode("utf-8") + b"\n")
+
+    async def run(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        batch = self.buffer
+        self.buffer = []
+        await asyncio.to_thread(self.write, batch)
+        self.written += len(batch)
+
+    def write(self, batch: list[bytes]):
+        """
+        Runs in a worker thread: one write and one fsync for the whole batch.
+        """
+        self.file.write(b"".join(batch))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.syncs += 1
+
+    async def close(self):
+        if self.writer:
+            self.stopping.set()
+            await self.writer  # Its last round writes whatever is left
+            self.writer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            print(f"Journal: {self.written} state change(s) written to {self.path} with {self.syncs} fsync(s).")
+
+
+JOURNAL = Journal(journal_path, journal_flush_interval)
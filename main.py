@@ -1,10 +1,22 @@
 import sys
 import asyncio
+import importlib
 
-from main_select_courses import main_select_courses
-from inquire_course_info import inquire_course_info
-from verify_cookie_validity import verify_cookie_validity
-from check_course import check_course
+from config import metrics_port
+
+# Command -> (module, coroutine function). Modules are imported only when their command runs,
+# so --start never pays for the inquiry code and the help text needs no third-party imports.
+COMMANDS = {
+    "--start": ("main_select_courses", "main_select_courses"),
+    "--inquire": ("inquire_course_info", "inquire_course_info"),
+    "--validate": ("verify_cookie_validity", "verify_cookie_validity"),
+    "--check": ("check_course", "check_course"),
+}
+
+
+def load_command(command: str):
+    module_name, function_name = COMMANDS[command]
+    return getattr(importlib.import_module(module_name), function_name)
 
 
 def display_help():
@@ -14,9 +26,15 @@ def display_help():
     print("Usage: python main.py <command>")
     print("Commands:")
     print("  --start    : Select courses for all users")
+    print("               [--endless] keep retrying until every course is selected")
+    print("               [--seats]   only attempt courses that queryStdCount shows have free seats")
+    print("               [--resume]  skip courses the journal of an earlier run shows as selected")
+    print("               [--workers N] shard the users across N processes")
     print("  --inquire  : Inquire course info")
     print("  --validate : Batch validate cookie validity")
     print("  --check    : Verify course availability")
+    print("               [--watch]   keep polling and print only the courses that open or fill")
+    print("  --startup-report [command] : Show what a command imports at startup and check --start against startup_budget_ms")
 
 
 async def main():
@@ -26,22 +44,49 @@ async def main():
         display_help()
         return
 
-    match args[1].lower():
+    command = args[1].lower()
+    if command == "--startup-report":
+        from startup_report import startup_report
+
+        if not startup_report(args[2].lower() if len(args) > 2 else "--start"):
+            raise SystemExit(1)
+        return
+    if command not in COMMANDS:
+        print("Error: Unknown command.")
+        display_help()
+        return
+
+    from metrics import METRICS
+
+    runner = await METRICS.serve(metrics_port) if metrics_port else None
+    try:
+        await run_command(command, args)
+    finally:
+        if runner:
+            await runner.cleanup()
+        METRICS.print_summary()
+
+
+async def run_command(command: str, args: list[str]):
+    run = load_command(command)
+    match command:
         case "--start":
-            if len(args) > 2 and args[2].lower() == "--endless":
+            options = [arg.lower() for arg in args[2:]]
+            workers = 1
+            if "--workers" in options:
+                value = (options[options.index("--workers") + 1 :] or [""])[0]
+                if not value.isdigit() or int(value) < 1:
+                    print("Error: --workers needs a number of processes, e.g. --workers 4.")
+                    return
+                workers = int(value)
+            endless = "--endless" in options
+            if endless:
                 print("Entering ENDLESS mode.")
-                await main_select_courses(endless=True)
-            else:
-                await main_select_courses()
-        case "--inquire":
-            await inquire_course_info()
-        case "--validate":
-            await verify_cookie_validity()
+            await run(endless=endless, seat_driven="--seats" in options, resume="--resume" in options, workers=workers)
         case "--check":
-            await check_course()
+            await run(watch="--watch" in [arg.lower() for arg in args[2:]])
         case _:
-            print("Error: Unknown command.")
-            display_help()
+            await run()
 
 
 if __name__ == "__main__":
@@ -1,215 +1,661 @@
 import asyncio
+import os
+import time
 import aiohttp
-import warnings
 from collections import deque
-from tqdm.asyncio import tqdm
-from urllib3.exceptions import InsecureRequestWarning
+from tqdm import tqdm
 
-try:
-    from aiohttp_socks import ProxyConnector
-except ImportError:
-    ProxyConnector = None
-
-from config import url, headers, data as base_data_payload, failed_words, error_words
-from custom import USE_PROXY, proxies, USER_CONFIGS
-
-warnings.simplefilter("ignore", InsecureRequestWarning)
+from config import (
+    url,
+    headers,
+    data as base_data_payload,
+    seat_poll_interval,
+    seat_record_path,
+    task_plan_path,
+    task_plan_poll_interval,
+    cookies_path,
+    cookies_poll_interval,
+    cookie_wait_timeout,
+    batch_size,
+    validation_concurrency,
+    cookie_revalidate_interval,
+    pacing_initial_interval,
+    pacing_min_interval,
+    pacing_max_interval,
+    pacing_timeout_floor,
+    pacing_timeout_ceiling,
+    node_max_in_flight,
+    node_max_rate,
+    total_max_in_flight,
+    total_max_rate,
+    preflight_check,
+)
+from credentials import watch_credentials
+from cookie_cache import CookieCache
+from custom import INQUIRY_USER_DATA
+from event_log import EVENTS, Event
+from http_pool import SharedPool
+from journal import JOURNAL, TaskState
+from metrics import METRICS
+from pacing import Pacer, PacingController, Signal
+from request_scheduler import RequestScheduler
+from response_classifier import CLASSIFIER, Outcome
+from task_plan import Task, TaskPlan, UserPlan, load_plan, watch_plan
+from verify_cookie_validity import check, open_cookie_cache
 
 ENDLESS = False
+BATCH_SIZE = batch_size  # Falls back to 1 once the server does not answer a batch course by course
+SEAT_SCHEDULER = None  # seat_scheduler.SeatScheduler in seat-driven mode
+PREFLIGHT = None  # preflight.Preflight unless preflight_check is off
+REPORTER = None  # workers.Reporter when this process is one of the --workers children
+REQUEST_SCHEDULER: RequestScheduler | None = None
+PACING = PacingController(
+    initial_interval=pacing_initial_interval,
+    min_interval=pacing_min_interval,
+    max_interval=pacing_max_interval,
+    timeout_floor=pacing_timeout_floor,
+    timeout_ceiling=pacing_timeout_ceiling,
+)
+THROTTLE_STATUSES = {429, 503}
+THROTTLE_ERROR_WORDS = {"503", "过快点击"}
 failed_courses: list[dict] = []
 
 
-async def attempt_single_course_selection(
+def report_outcome(outcome: Outcome, word: str, ids: dict) -> str:
+    """
+    Emits the event of one course's outcome and returns the status the loop acts on.
+    """
+    match outcome:
+        case Outcome.SUCCESS:
+            EVENTS.emit(Event.SELECTED, **ids)
+            return "success"
+        case Outcome.ALREADY_SELECTED:
+            EVENTS.emit(Event.ALREADY_SELECTED, **ids, word=word)
+            return "already-selected"
+        case Outcome.FULL | Outcome.CONFLICT:
+            EVENTS.emit(Event.REJECTED, **ids, outcome=outcome.value, word=word)
+            return "failed"
+        case Outcome.CLOSED | Outcome.THROTTLED | Outcome.ERROR:
+            EVENTS.emit(Event.RETRYABLE, **ids, outcome=outcome.value, word=word)
+        case _:
+            EVENTS.emit(Event.UNCLEAR, **ids)
+    return "error"
+
+
+async def attempt_course_selection(
     session: aiohttp.ClientSession,
-    course_id: str,
+    course_ids: list[str],
     user_cookies: dict,
     user_params: dict,
     user_label: str,
-) -> str:
+    pacer: Pacer,
+) -> dict[str, str] | None:
     """
-    Makes a single attempt to select a course for a specific user.
-    Sets the provided succeed_event if successful.
+    Makes a single attempt to select one or more courses for a specific user, sent as
+    operator0..operatorN of one request, and returns a status per course id.
+    None when the server does not answer several courses course by course.
+    What the server's answer says about its load is reported to the pacer.
     """
 
     current_data_payload = base_data_payload.copy()
-    current_data_payload["operator0"] = f"{course_id}:true:0"
+    for index, course_id in enumerate(course_ids):
+        current_data_payload[f"operator{index}"] = f"{course_id}:true:0"
 
     request_kwargs = {
         "headers": headers,
         "cookies": user_cookies,
         "params": user_params,
         "data": current_data_payload,
-        "timeout": 1,
+        "timeout": pacer.timeout,
         "ssl": False,  # disables SSL cert verification
         "allow_redirects": False,
     }
 
-    profileId = user_params.get("profileId", "N/A")
+    profile = user_params.get("profileId", "N/A")
+    ids = {"user": user_label, "profile": profile, "course": ",".join(course_ids)}
+    statuses = dict.fromkeys(course_ids, "error")
+    signal = Signal.NEUTRAL
+    result = "exception"  # Of the whole request; courses classified from a reply have their own
+    results: dict[str, str] = {}
+    admitted_at = None
 
     try:
-        async with session.post(url, **request_kwargs) as response:
-            response_text = await response.text()
-            print(f"User {user_label} ({profileId}) - Course ID {course_id}: Status {response.status}")
-
+        async with REQUEST_SCHEDULER.slot(user_label, pacer.node) as admitted_at, session.post(url, **request_kwargs) as response:
             if response.status == 200:
-                if "已经选过" in response_text or not (any(word in response_text for word in failed_words) or any(word in response_text for word in error_words)):
-                    if "已经选过" in response_text:
-                        print(f"User {user_label} ({profileId}) - Course ID {course_id}: Already selected.\n")
-                    else:
-                        print(f"User {user_label} ({profileId}) - Course ID {course_id}: Selection Succeeded!\n")
-                    return "success"
-                elif any(word in response_text for word in failed_words):
-                    print(f"User {user_label} ({profileId}) - Course ID {course_id}: Failed (reason: {response_text.strip()}).\n")
-                    return "failed"
-                elif "当前选课不开放" in response_text:
-                    print(f"User {user_label} ({profileId}) - Course ID {course_id}: Failed (error: 操作失败:当前选课不开放).\n")
-                elif "请不要过快点击" in response_text:
-                    print(f"User {user_label} ({profileId}) - Course ID {course_id}: Failed (error: 请不要过快点击).\n")
-                elif any(word in response_text for word in error_words):
-                    print(f"User {user_label} ({profileId}) - Course ID {course_id}: Failed (error: {response_text.strip()}).\n")
+                if len(course_ids) == 1:
+                    outcomes = {course_ids[0]: await CLASSIFIER.classify_response(response)}
                 else:
-                    print(f"User {user_label} ({profileId}) - Course ID {course_id}: 200 OK, outcome unclear (response: {response_text.strip()}).\n")
+                    outcomes = CLASSIFIER.classify_batch(await response.text(), course_ids)
+                    if outcomes is None:
+                        result = "batch-unattributed"
+                        EVENTS.emit(Event.BATCH_REJECTED, **ids, reason="reply does not name every course")
+                        return None
+
+                for course_id, (outcome, word) in outcomes.items():
+                    results[course_id] = outcome.value
+                    if outcome is Outcome.THROTTLED or (outcome is Outcome.ERROR and word in THROTTLE_ERROR_WORDS):
+                        signal = Signal.THROTTLED
+                    elif signal is Signal.NEUTRAL and outcome in (Outcome.SUCCESS, Outcome.ALREADY_SELECTED, Outcome.FULL, Outcome.CONFLICT):
+                        signal = Signal.ACCEPTED
+                    statuses[course_id] = report_outcome(outcome, word, {**ids, "course": course_id})
             elif response.status == 302:
-                print(f"User {user_label} ({profileId}) - Course ID {course_id}: Non-200 Status 302. Please check your cookies!!!")
-                print(f"Status 302 redirecting to {response.headers.get('Location')}\n")
-                return "redirect"
+                result = "redirect"
+                EVENTS.emit(Event.REDIRECTED, **ids, location=response.headers.get("Location"))
+                statuses = dict.fromkeys(course_ids, "redirect")
             else:
-                print(f"User {user_label} ({profileId}) - Course ID {course_id}: Non-200 Status {response.status} (response: {response_text.strip()}).\n")
+                result = f"http-{response.status}"
+                if response.status in THROTTLE_STATUSES:
+                    signal = Signal.THROTTLED
+                response_text = await response.text()
+                EVENTS.emit(Event.HTTP_STATUS, **ids, status=response.status, body=response_text.strip()[:200])
+                if len(course_ids) > 1 and 400 <= response.status < 500 and response.status not in THROTTLE_STATUSES:
+                    EVENTS.emit(Event.BATCH_REJECTED, **ids, reason=f"status {response.status}")
+                    return None
 
     except asyncio.TimeoutError:
-        print(f"User {user_label} ({profileId}) - Course ID {course_id}: Request timed out.\n")
+        signal = Signal.TIMEOUT
+        result = "timeout"
+        EVENTS.emit(Event.TIMEOUT, **ids, timeout=pacer.timeout)
     except aiohttp.ClientError as e:
-        print(f"User {user_label} ({profileId}) - Course ID {course_id}: Network ClientError: {e}\n")
+        signal = Signal.FAILED
+        result = "network-error"
+        EVENTS.emit(Event.NETWORK_ERROR, **ids, error=str(e))
     except Exception as e:
-        print(f"User {user_label} ({profileId}) - Course ID {course_id}: Exception: {e}\n")
+        EVENTS.emit(Event.EXCEPTION, **ids, error=repr(e))
+    finally:
+        elapsed = time.monotonic() - admitted_at if admitted_at is not None else None
+        if elapsed is not None:
+            METRICS.observe("batchOperator", elapsed)
+            for course_id in course_ids:
+                METRICS.count("batchOperator", results.get(course_id, result))
+        pacer.record(signal, elapsed if signal not in (Signal.TIMEOUT, Signal.FAILED) else None)
 
-    return "error"
+    return statuses
 
 
-async def run_loop_for_single_user(
-    user_label: str,
-    user_cookies: dict,
-    user_tables: list[dict],
-):
-    connector = None
-    if USE_PROXY:
-        if ProxyConnector and "all" in proxies:
-            proxy_url_val = proxies["all"]
-            if proxy_url_val:
-                connector = ProxyConnector.from_url(proxy_url_val)
-            else:
-                print(f"Warning (User {user_label}): USE_PROXY is True, but proxy URL is empty. No proxy.")
-        elif not ProxyConnector:
-            print(f"Warning (User {user_label}): USE_PROXY is True, but aiohttp-socks not installed. No proxy.")
-        else:
-            print(f"Warning (User {user_label}): USE_PROXY is True, but 'all' proxy key missing. No proxy.")
-
-    async with aiohttp.ClientSession(connector=connector) as session:
-        task_queue = deque()
-        task_data_map = {}
-
-        # Interleaved append tasks
-        max_length = max(len(table.get("course_ids", [])) for table in user_tables if table.get("profileId")) or 0
-        for i in range(max_length):
-            for table in user_tables:
-                profileId = table.get("profileId")
-                course_ids = table.get("course_ids", [])
-                if not profileId or not course_ids:
-                    print(f"Missing parameter in {user_label}'s table: profileId={profileId}, course_ids={course_ids}")
-                    continue
-                if i < len(course_ids):
-                    course_id = course_ids[i]
-                    task_key = (profileId, course_id)
-                    task_data = {
-                        "session": session,
-                        "course_id": course_id,
-                        "user_cookies": user_cookies,
-                        "user_params": {"profileId": profileId},
-                        "user_label": user_label,
-                    }
-                    task_queue.append(task_key)
-                    task_data_map[task_key] = task_data
-
-        if not task_queue:
-            print(f"No valid tasks found for user: {user_label}. Exiting selection process.")
+async def wait_for_open_task(task_queue: deque[Task], retry_interval: float):
+    """
+    Blocks until one of the queued courses has a free seat, then rotates it to the front.
+    """
+    await SEAT_SCHEDULER.wait_for_any_open(lambda: (task.course_id for task in task_queue), retry_interval)
+    for _ in range(len(task_queue)):
+        if SEAT_SCHEDULER.is_open(task_queue[0].course_id):
             return
+        task_queue.rotate(-1)
 
-        print(f"\nStarting selection for {len(task_queue)} course(s) for user {user_label}...\n")
 
-        while True:
-            task_key = task_queue.popleft()
-            task_data: dict = task_data_map[task_key]
-            status = await attempt_single_course_selection(**task_data)
-            # print(status + "\n")
+class UserRun:
+    """
+    Queue and cookies of one user's selection loop. A reloaded plan is applied through
+    apply() while the loop runs; the loop reads both before every attempt.
+    """
+
+    def __init__(self, plan: UserPlan, selected: set[Task]):
+        self.label = plan.label
+        self.cookies = dict(plan.cookies)
+        self.plan_cookies = plan.cookies
+        self.cookies_arrived = asyncio.Event()
+        self.expired_cookies: dict | None = None  # Cookies a validation check found expired
+        self.tasks: set[Task] = set()
+        self.queue: deque[Task] = deque()
+        self.in_flight: tuple[Task, ...] = ()  # The tasks of the request being sent
+        self.finished = {task for task in plan.tasks if task in selected}  # Selected or given up, never queued again
+        self.apply(plan)
+
+    def apply(self, plan: UserPlan) -> tuple[int, int]:
+        """
+        Brings the queue in line with the plan and returns (added, removed) task counts.
+        A removed task that is in flight is not queued again once its answer is in.
+        """
+        wanted = set(plan.tasks)
+        removed = [task for task in self.queue if task not in wanted]
+        for task in removed:
+            self.queue.remove(task)
+        removed += [task for task in self.in_flight if task in self.tasks and task not in wanted]
+        for task in removed:
+            JOURNAL.record(task, TaskState.REMOVED)
+        if SEAT_SCHEDULER:
+            for task in removed:
+                SEAT_SCHEDULER.unregister(task.course_id)
+
+        added = [task for task in plan.tasks if task not in self.tasks and task not in self.finished and task not in self.in_flight]
+        self.queue.extend(added)
+        for task in added:
+            JOURNAL.record(task, TaskState.QUEUED)
+        if SEAT_SCHEDULER:
+            for task in added:
+                SEAT_SCHEDULER.register(task.course_id)
+        self.tasks = wanted
+        if plan.cookies != self.plan_cookies:  # Otherwise cookies from the credentials file would be reverted
+            self.plan_cookies = plan.cookies
+            self.set_cookies(plan.cookies)
+        return len(added), len(removed)
+
+    def set_cookies(self, cookies: dict):
+        if cookies.get("JSESSIONID") and cookies != self.cookies:
+            self.cookies = dict(cookies)
+            self.cookies_arrived.set()
+
+    def mark_expired(self, cookies: dict):
+        if cookies is self.cookies:
+            self.expired_cookies = cookies
+
+    async def wait_for_cookies(self, sent_with: dict) -> bool:
+        """
+        Parks the user after a 302 or a failed validation check until cookies other than
+        sent_with arrive. False when cookie_wait_timeout passes first (only without --endless).
+        """
+        if self.cookies is not sent_with:
+            return True  # Replaced while the redirected request was in flight
+        self.expired_cookies = sent_with
+        self.cookies_arrived.clear()
+        EVENTS.emit(Event.PARKED, user=self.label, tasks=len(self.queue), path=cookies_path)
+        parked_at = time.monotonic()
+        try:
+            await asyncio.wait_for(self.cookies_arrived.wait(), None if ENDLESS else cookie_wait_timeout)
+        except asyncio.TimeoutError:
+            return False
+        EVENTS.emit(Event.RESUMED, user=self.label, tasks=len(self.queue), waited=time.monotonic() - parked_at)
+        return True
+
+    def finish(self, task: Task, state: TaskState):
+        JOURNAL.record(task, state)
+        self.finished.add(task)
+        self.tasks.discard(task)
+        if SEAT_SCHEDULER:
+            SEAT_SCHEDULER.unregister(task.course_id)
+
+
+def add_failed(task: Task):
+    failed_courses.append(
+        {
+            "user_label": task.user,
+            "profileId": task.profile_id,
+            "course_id": task.course_id,
+        }
+    )
+
+
+def give_up(run: UserRun, task: Task, reason: str):
+    EVENTS.emit(Event.GAVE_UP, user=run.label, profile=task.profile_id, course=task.course_id, reason=reason)
+    add_failed(task)
+    run.finish(task, TaskState.GAVE_UP)
+
+
+def cancel_siblings(run: UserRun, task: Task, cancel: bool):
+    """
+    Takes the queued alternatives of a selected course off the queue, without sending them.
+    Only when this request selected it (cancel): 已经选过 does not say which lesson of the
+    course the user holds, so its alternatives are still sent.
+    """
+    siblings = PREFLIGHT.on_selected(task)
+    if not cancel:
+        return
+    for sibling in siblings:
+        if sibling in run.queue:
+            run.queue.remove(sibling)
+            EVENTS.emit(Event.SUPERSEDED, user=run.label, profile=sibling.profile_id, course=sibling.course_id, selected=task.course_id)
+            run.finish(sibling, TaskState.SUPERSEDED)
+            PREFLIGHT.cancelled += 1
+
+
+def give_up_full(run: UserRun):
+    """
+    Without --endless a full course would be sent once and given up on: the courses the
+    latest poll shows full are given up on without that request.
+    """
+    for task in [task for task in run.queue if not SEAT_SCHEDULER.is_open(task.course_id)]:
+        run.queue.remove(task)
+        give_up(run, task, "full")
+        SEAT_SCHEDULER.avoided += 1
+    if run.queue:
+        SEAT_SCHEDULER.dispatched += 1
+
+
+def give_up_queue(run: UserRun, reason: str):
+    for task in list(run.queue):
+        give_up(run, task, reason)
+    run.queue.clear()
+
+
+def take_batch(task_queue: deque[Task]) -> tuple[Task, ...]:
+    """
+    The task at the front of the queue plus, up to BATCH_SIZE, the next queued tasks of the
+    same profileId (only those with a free seat in seat-driven mode). Alternatives of a course
+    already in the batch are left for a later request.
+    """
+    first = task_queue.popleft()
+    batch = [first]
+    for task in list(task_queue):
+        if len(batch) >= BATCH_SIZE:
+            break
+        if PREFLIGHT and PREFLIGHT.clashes_with(task, batch):
+            continue
+        if task.profile_id == first.profile_id and (not SEAT_SCHEDULER or SEAT_SCHEDULER.is_open(task.course_id)):
+            task_queue.remove(task)
+            batch.append(task)
+    return tuple(batch)
+
+
+async def run_loop_for_single_user(session: aiohttp.ClientSession, run: UserRun):
+    if not run.queue:
+        EVENTS.emit(Event.USER_FINISHED if run.finished else Event.NO_TASKS, user=run.label)
+        return
+
+    EVENTS.emit(Event.USER_STARTED, user=run.label, tasks=len(run.queue))
 
+    while run.queue:
+        if run.expired_cookies is run.cookies:
+            if not await run.wait_for_cookies(run.cookies):
+                give_up_queue(run, "expired")
+            continue
+        if SEAT_SCHEDULER:
+            if ENDLESS:
+                await wait_for_open_task(run.queue, PACING.pacer(run.label, run.cookies).interval)
+            else:
+                give_up_full(run)
+            if not run.queue:
+                break
+        batch = run.in_flight = take_batch(run.queue)
+        cookies = run.cookies
+        pacer = PACING.pacer(run.label, cookies)
+        for task in batch:
+            METRICS.attempt(run.label, task.course_id)
+        try:
+            statuses = await attempt_course_selection(
+                session=session,
+                course_ids=[task.course_id for task in batch],
+                user_cookies=cookies,
+                user_params={"profileId": batch[0].profile_id},
+                user_label=run.label,
+                pacer=pacer,
+            )
+        finally:
+            run.in_flight = ()
+
+        if statuses is None:
+            global BATCH_SIZE
+            BATCH_SIZE = 1  # The server does not take batches: the same courses go again one per request
+            run.queue.extendleft(reversed([task for task in batch if task in run.tasks]))
+            continue
+
+        redirected = []
+        for task in batch:
+            if task not in run.tasks:
+                continue  # Removed from the plan while its request was in flight
+            status = statuses[task.course_id]
             match status:
-                case "success":
-                    del task_data_map[task_key]
-                case "failed" | "redirect":
+                case "success" | "already-selected":
+                    METRICS.succeeded(run.label, task.course_id)
+                    run.finish(task, TaskState.SELECTED)
+                    if PREFLIGHT:
+                        cancel_siblings(run, task, cancel=status == "success")
+                case "redirect":
+                    redirected.append(task)
+                case "failed":
+                    if SEAT_SCHEDULER:
+                        SEAT_SCHEDULER.mark_full(task.course_id)
                     if ENDLESS:
-                        task_queue.append(task_key)
+                        run.queue.append(task)
                     else:
-                        print(f"Failed completely - ({task_key[0]}, {task_key[1]}) of {user_label}")
-                        failed_courses.append(
-                            {
-                                "user_label": user_label,
-                                "profileId": task_key[0],
-                                "course_id": task_key[1],
-                            }
-                        )
-                        del task_data_map[task_key]
+                        give_up(run, task, status)
                 case "error" | _:
-                    if task_queue:
-                        top_task = task_queue.popleft()
-                        task_queue.appendleft(task_key)
-                        task_queue.appendleft(top_task)
+                    if run.queue:
+                        top_task = run.queue.popleft()
+                        run.queue.appendleft(task)
+                        run.queue.appendleft(top_task)
                     else:
-                        task_queue.append(task_key)
+                        run.queue.append(task)
 
-            if task_queue:
-                await asyncio.sleep(0.2)
-            else:
-                break
+        if redirected:
+            run.queue.extendleft(reversed(redirected))  # The session expired, not the courses: they go first once resumed
+            if not await run.wait_for_cookies(cookies):
+                give_up_queue(run, "redirect")
+
+        if run.queue:
+            await asyncio.sleep(pacer.interval)
+
+    EVENTS.emit(Event.USER_FINISHED, user=run.label)
+
+
+class Selection:
+    """
+    The user loops of one --start run on the shared pool. apply() is called with the first
+    plan and again with every reloaded one: new users get a loop, removed users are stopped
+    and the others have their queues edited in place, so no session or connection is dropped.
+    """
+
+    def __init__(self, pool: SharedPool, plan: TaskPlan, selected: set[Task], cookie_cache: CookieCache):
+        self.pool = pool
+        self.plan = plan  # Before the pre-flight check, which runs again on it when the catalogs change
+        self.selected = selected  # Selected in an earlier run, from the journal
+        self.cookie_cache = cookie_cache
+        self.runs: dict[str, UserRun] = {}
+        self.loops: dict[str, asyncio.Task] = {}
+        self.finished_loops: list[asyncio.Task] = []
+        self.changed = asyncio.Event()
+        self.progress = REPORTER.progress if REPORTER else tqdm(total=0, desc="Total Course Selection Progress")
+
+    def start(self, run: UserRun):
+        loop = asyncio.ensure_future(run_loop_for_single_user(self.pool.session(run.label), run))
+        loop.add_done_callback(lambda _: self.progress.update(1))
+        self.loops[run.label] = loop
+        self.progress.total += 1
+        self.progress.refresh()
 
-    print(f"User {user_label} - Course selection processes has concluded.")
+    def apply(self, plan: TaskPlan) -> dict[str, int]:
+        changes = {"users_added": 0, "users_removed": 0, "tasks_added": 0, "tasks_removed": 0}
+        for label in [label for label in self.runs if label not in plan.users]:
+            run = self.runs.pop(label)
+            _, removed = run.apply(UserPlan(label, run.plan_cookies, ()))  # Journaled and unregistered like removed courses
+            changes["tasks_removed"] += removed
+            changes["users_removed"] += 1
+            self.loops[label].cancel()
 
+        for label, user_plan in plan.users.items():
+            run = self.runs.get(label)
+            if run is None:
+                run = self.runs[label] = UserRun(user_plan, self.selected)
+                status = self.cookie_cache.lookup(label, run.cookies)
+                if status and status.expired:
+                    run.mark_expired(run.cookies)  # Parked before its first request
+                changes["users_added"] += 1
+                changes["tasks_added"] += len(run.queue)
+                self.start(run)
+                continue
+            added, removed = run.apply(user_plan)
+            changes["tasks_added"] += added
+            changes["tasks_removed"] += removed
+            loop = self.loops[label]
+            if loop.done() and run.queue:
+                self.finished_loops.append(loop)
+                self.start(run)  # Its loop had already run out of courses
+            elif not loop.done() and not run.queue and not run.in_flight:
+                loop.cancel()  # Every course of the user was removed
+        self.changed.set()
+        return changes
 
-async def main_select_courses(endless=False):
-    if not USER_CONFIGS:
-        print("No user configurations found in custom.py. Exiting course selection.")
+    def reload(self, plan: TaskPlan):
+        self.plan = own_users(plan)
+        plan = checked(self.plan)
+        plan.print_problems()
+        changes = self.apply(plan)
+        if any(changes.values()):
+            EVENTS.emit(Event.PLAN_RELOADED, **changes)
+
+    def recheck(self):
+        """
+        Checks the plan again once the pre-flight catalogs were refreshed.
+        """
+        self.apply(checked(self.plan))
+
+    async def revalidate(self, interval: float):
+        """
+        Checks the cookies of every user still selecting with a GET of stdElectCourse.action
+        every interval seconds. A user whose session is gone is parked before its next
+        batchOperator request instead of finding out from a 302.
+        """
+        limit = asyncio.Semaphore(validation_concurrency)
+        while True:
+            await asyncio.sleep(interval)
+            runs = [run for run in self.runs.values() if run.queue and run.expired_cookies is not run.cookies]
+            sent = [run.cookies for run in runs]
+            results = await asyncio.gather(*(check(self.pool.session(run.label), run.label, cookies, limit) for run, cookies in zip(runs, sent)))
+            for run, cookies, result in zip(runs, sent, results):
+                self.cookie_cache.store(run.label, cookies, result.success, result.expired, result.reason)
+                if result.expired:
+                    run.mark_expired(cookies)
+
+    def update_cookies(self, credentials: dict[str, dict]):
+        for label, cookies in credentials.items():
+            if label in self.runs:
+                self.runs[label].set_cookies(cookies)
+
+    async def wait(self):
+        """
+        Returns once every user loop has ended, including loops started by a reload meanwhile.
+        """
+        while pending := [loop for loop in self.loops.values() if not loop.done()]:
+            self.changed.clear()
+            changed = asyncio.ensure_future(self.changed.wait())
+            await asyncio.wait([*pending, changed], return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+        for loop in self.finished_loops + list(self.loops.values()):
+            if not loop.cancelled():
+                loop.result()  # Raises what a user loop raised, as tqdm.gather did
+
+    def close(self):
+        for loop in self.loops.values():
+            loop.cancel()
+        self.progress.close()
+
+
+def own_users(plan: TaskPlan) -> TaskPlan:
+    """
+    The users this process selects for: all of them, or its shard in a --workers child.
+    """
+    return plan.shard(REPORTER.index, REPORTER.count) if REPORTER else plan
+
+
+def checked(plan: TaskPlan) -> TaskPlan:
+    """
+    The plan without the courses the pre-flight check finds cannot be selected. Those are given
+    up on at once, each one a request that is never sent.
+    """
+    if not PREFLIGHT:
+        return plan
+    plan, dropped = PREFLIGHT.check(plan)
+    for task, reason in dropped:
+        EVENTS.emit(Event.DROPPED, user=task.user, profile=task.profile_id, course=task.course_id, reason=reason)
+        add_failed(task)
+        JOURNAL.record(task, TaskState.GAVE_UP)
+    return plan
+
+
+async def main_select_courses(endless=False, seat_driven=False, resume=False, workers=1):
+    plan = load_plan(task_plan_path)
+    if workers > 1 and plan.users:
+        from workers import run_workers  # multiprocessing is only loaded with --workers
+
+        await run_workers(plan, workers, endless, seat_driven, resume)
+        return
+
+    plan = own_users(plan)
+    plan.print_problems()
+    if not plan.users:
+        print(f"No user configurations found in {task_plan_path}. Exiting course selection.")
         return
-    
+
     global ENDLESS
     ENDLESS = endless
 
-    peer_selection_tasks = []
+    async with EVENTS, SharedPool(owner_label="Selection") as pool:
+        if not seat_driven:
+            await run_all_users(pool, plan, resume)
+            return
+
+        from seat_scheduler import SeatScheduler  # Pulls in the enrollment parser, only needed with --seats
+        from seat_recorder import open_recorder
+
+        global SEAT_SCHEDULER
+        inquiry_label = INQUIRY_USER_DATA.get("label", "Unknown_User")
+        SEAT_SCHEDULER = SeatScheduler(
+            session=pool.session(inquiry_label),
+            cookies=INQUIRY_USER_DATA.get("cookies"),
+            poll_interval=seat_poll_interval,
+            recorder=open_recorder(seat_record_path),
+        )
+        if REPORTER:  # The parent polls for every worker
+            snapshots = REPORTER.seat_snapshots()
+            SEAT_SCHEDULER.take(await anext(snapshots))
+            poller = asyncio.create_task(SEAT_SCHEDULER.follow(snapshots))
+        else:
+            print(f"Seat-driven mode: polling enrollment every {seat_poll_interval}s.")
+            await SEAT_SCHEDULER.poll_once()
+            poller = asyncio.create_task(SEAT_SCHEDULER.run())
+        try:
+            await run_all_users(pool, plan, resume)
+        finally:
+            poller.cancel()
+            SEAT_SCHEDULER.print_summary()
+            if SEAT_SCHEDULER.recorder:
+                SEAT_SCHEDULER.recorder.close()
+
+
+async def run_all_users(pool: SharedPool, plan: TaskPlan, resume: bool):
+    global REQUEST_SCHEDULER
+    REQUEST_SCHEDULER = RequestScheduler(
+        node_max_in_flight=node_max_in_flight,
+        node_max_rate=node_max_rate,
+        total_max_in_flight=total_max_in_flight,
+        total_max_rate=total_max_rate,
+    )
+    states = await JOURNAL.open(resume)
     print("Preparing course selection tasks for all users...")
+    print(f"\nStarting selection for {len(plan.users)} user(s)...\n")
 
-    for peer_config in USER_CONFIGS:
-        user_label = peer_config.get("label", "Unknown_User")
-        user_cookies = peer_config.get("cookies")
-        user_tables = peer_config.get("tables")
+    selected = {task for task, state in states.items() if state is TaskState.SELECTED}
+    if preflight_check:
+        from preflight import Preflight, cached_catalogs, refresh_catalogs
 
-        if not user_cookies:
-            print(f"Cannot get user {user_label}'s cookies. Skip...")
-            continue
+        global PREFLIGHT
+        PREFLIGHT = Preflight(cached_catalogs(plan), selected)
 
-        peer_selection_tasks.append(
-            run_loop_for_single_user(
-                user_label=user_label,
-                user_cookies=user_cookies,
-                user_tables=user_tables,
-            )
-        )
+    cookie_cache = open_cookie_cache()
+    selection = Selection(pool, plan, selected, cookie_cache)
+    watchers = [asyncio.create_task(watch_credentials(cookies_path, selection.update_cookies, cookies_poll_interval))]
+    if cookie_revalidate_interval:
+        watchers.append(asyncio.create_task(selection.revalidate(cookie_revalidate_interval)))
+    try:
+        selection.apply(checked(plan))
+        if PREFLIGHT:
+            watchers.append(asyncio.create_task(refresh_catalogs(pool, plan, PREFLIGHT, selection.recheck)))
+        if ENDLESS and os.path.exists(task_plan_path):
+            watchers.append(asyncio.create_task(watch_plan(task_plan_path, selection.reload, task_plan_poll_interval)))
+        await selection.wait()
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+        selection.close()
+        await REQUEST_SCHEDULER.close()
+        await JOURNAL.close()
+        cookie_cache.close()
+    pool.print_stats()
+    PACING.print_summary()
+    REQUEST_SCHEDULER.print_summary()
+    if PREFLIGHT:
+        PREFLIGHT.print_summary()
+
+    if not REPORTER:  # A worker sends its failures to the parent, which prints them for all workers
+        print_failed_courses(failed_courses)
+    await asyncio.sleep(0.1)  # Add a small delay to ensure all print statements from tasks are flushed
 
-    print(f"\nStarting selection for {len(peer_selection_tasks)} user(s)...\n")
-    await tqdm.gather(*peer_selection_tasks, desc="Total Course Selection Progress")
 
+def print_failed_courses(failures: list[dict]):
     print("\nAll course selection tasks have been processed.")
-    if failed_courses:
+    if failures:
         print("\nSummary of failed course selections:")
-        for failure in failed_courses:
+        for failure in failures:
             print(f"User {failure['user_label']} ({failure['profileId']}) - Course ID {failure['course_id']}: Failed.")
     else:
         print("\nNo failed course selections.")
-    await asyncio.sleep(0.1)  # Add a small delay to ensure all print statements from tasks are flushed
@@ -0,0 +1,173 @@
+"""
+In-process metrics of the HTTP paths: request latency histograms per endpoint, response
+outcome counters, attempts per course and time to success per (user, course).
+
+Recording is a bisect and a few dict updates. The numbers can be scraped in Prometheus text
+format from http://127.0.0.1:<metrics_port>/metrics while a command runs, and a summary is
+printed when it ends.
+"""
+
+import bisect
+import time
+
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+def label_text(**labels) -> str:
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: list[float] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: "Histogram"):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, fraction: float) -> float | None:
+        """
+        Upper bound of the bucket holding the given fraction of observations.
+        """
+        if not self.count:
+            return None
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= fraction * self.count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self.latency: dict[str, Histogram] = {}
+        self.outcomes: dict[tuple[str, str], int] = {}
+        self.attempts: dict[tuple[str, str], int] = {}
+        self.first_attempt: dict[tuple[str, str], float] = {}
+        self.time_to_success: dict[tuple[str, str], float] = {}
+
+    def clear(self):
+        self.__init__()
+
+    def merge(self, other: "Metrics"):
+        """
+        Adds the numbers of another process's Metrics, e.g. of a --workers child.
+        """
+        for endpoint, histogram in other.latency.items():
+            self.latency.setdefault(endpoint, Histogram()).merge(histogram)
+        for key, count in other.outcomes.items():
+            self.outcomes[key] = self.outcomes.get(key, 0) + count
+        for key, count in other.attempts.items():
+            self.attempts[key] = self.attempts.get(key, 0) + count
+        for key, started in other.first_attempt.items():
+            self.first_attempt[key] = min(started, self.first_attempt.get(key, started))
+        self.time_to_success.update(other.time_to_success)
+
+    def observe(self, endpoint: str, seconds: float, outcome: str | None = None):
+        """
+        One latency sample, and one outcome unless the caller counts outcomes itself.
+        """
+        histogram = self.latency.get(endpoint)
+        if histogram is None:
+            histogram = self.latency[endpoint] = Histogram()
+        histogram.observe(seconds)
+        if outcome is not None:
+            self.count(endpoint, outcome)
+
+    def count(self, endpoint: str, outcome: str):
+        key = (endpoint, outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def attempt(self, user: str, course: str):
+        key = (user, course)
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        if key not in self.first_attempt:
+            self.first_attempt[key] = time.monotonic()
+
+    def succeeded(self, user: str, course: str):
+        key = (user, course)
+        if key in self.first_attempt and key not in self.time_to_success:
+            self.time_to_success[key] = time.monotonic() - self.first_attempt[key]
+
+    def render(self) -> str:
+        lines = [
+            "# HELP shiep_request_duration_seconds Request latency per endpoint.",
+            "# TYPE shiep_request_duration_seconds histogram",
+        ]
+        for endpoint, histogram in self.latency.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"shiep_request_duration_seconds_bucket{label_text(endpoint=endpoint, le=bound)} {cumulative}")
+            lines.append(f"shiep_request_duration_seconds_sum{label_text(endpoint=endpoint)} {histogram.total}")
+            lines.append(f"shiep_request_duration_seconds_count{label_text(endpoint=endpoint)} {histogram.count}")
+
+        lines += ["# HELP shiep_responses_total Responses per endpoint and outcome, one per course for batchOperator.", "# TYPE shiep_responses_total counter"]
+        for (endpoint, outcome), count in self.outcomes.items():
+            lines.append(f"shiep_responses_total{label_text(endpoint=endpoint, outcome=outcome)} {count}")
+
+        lines += ["# HELP shiep_course_attempts_total Selection attempts per user and course.", "# TYPE shiep_course_attempts_total counter"]
+        for (user, course), count in self.attempts.items():
+            lines.append(f"shiep_course_attempts_total{label_text(user=user, course=course)} {count}")
+
+        lines += [
+            "# HELP shiep_time_to_success_seconds Seconds from the first attempt to the selection of a course.",
+            "# TYPE shiep_time_to_success_seconds gauge",
+        ]
+        for (user, course), seconds in self.time_to_success.items():
+            lines.append(f"shiep_time_to_success_seconds{label_text(user=user, course=course)} {seconds}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port: int):
+        from aiohttp import web  # The server part of aiohttp is only loaded when metrics_port is set
+
+        async def scrape(request: web.Request) -> web.Response:
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", scrape)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        print(f"Metrics available at http://127.0.0.1:{port}/metrics")
+        return runner
+
+    def print_summary(self):
+        if not self.latency and not self.outcomes:
+            return
+        print("\n--- Metrics Summary ---")
+        for endpoint, histogram in self.latency.items():
+            outcomes = ", ".join(f"{outcome} {count}" for (name, outcome), count in self.outcomes.items() if name == endpoint)
+            print(
+                f"{endpoint}: {histogram.count} request(s), mean {histogram.total / histogram.count * 1000:.0f} ms, "
+                f"p50 <= {histogram.quantile(0.50) * 1000:.0f} ms, p99 <= {histogram.quantile(0.99) * 1000:.0f} ms ({outcomes})"
+            )
+        for endpoint in dict.fromkeys(name for name, _ in self.outcomes):
+            if endpoint not in self.latency:
+                print(f"{endpoint}: " + ", ".join(f"{outcome} {count}" for (name, outcome), count in self.outcomes.items() if name == endpoint))
+        retried = sorted(((count - 1, key) for key, count in self.attempts.items() if count > 1), reverse=True)
+        if retried:
+            print("Most retried: " + ", ".join(f"{user}/{course} {retries}x" for retries, (user, course) in retried[:5]))
+        if self.time_to_success:
+            seconds = sorted(self.time_to_success.values())
+            print(
+                f"Time to success: {len(seconds)} course(s), median {seconds[len(seconds) // 2]:.2f}s, "
+                f"slowest {seconds[-1]:.2f}s after the first attempt"
+            )
+
+
+METRICS = Metrics()
@@ -0,0 +1,265 @@
+"""
+Local stand-in for the EAMS course selection endpoints, for offline testing and benchmarking.
+
+Run it, then point the scripts at it:
+    python mock_server.py --port 8080 --courses 500
+    SHIEP_BASE_URL=http://127.0.0.1:8080 python main.py --start
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from aiohttp import web
+
+COURSE_TYPES = ["必修", "选修", "通识", "体育"]
+TEACHERS = ["王老师", "李老师", "张老师", "刘老师", "陈老师", "Smith"]
+NAMES = ["高等数学", "大学物理", "电路原理", "程序设计", "Academic Writing", "电力系统分析", "大学英语"]
+# Apostrophes and trailing commas, which the old regex-based JSON fix-up can't cope with
+TRICKY_TEACHERS = ["O'Brien", "D'Angelo"]
+TRICKY_NAMES = ["Director's Seminar", "Children's Literature"]
+
+SUCCESS_TEXT = "选课成功"
+ALREADY_TEXT = "你已经选过该课程了"
+FULL_TEXT = "选课失败:人数已满"
+CONFLICT_TEXT = "选课失败:与已选课程时间冲突"
+NOT_FOUND_TEXT = "操作失败:没有找到该课程"
+CLOSED_TEXT = "操作失败:当前选课不开放"
+THROTTLE_TEXT = "请不要过快点击"
+UNAVAILABLE_TEXT = "503 Service Unavailable"
+
+
+class MockCourse:
+    __slots__ = ("id", "no", "name", "credits", "type", "teacher", "course_id", "week_day", "start_unit", "sc", "lc")
+
+    def __init__(self, lesson_id: int, rng: random.Random, tricky: bool = False):
+        self.id = lesson_id
+        self.no = f"L{lesson_id}"
+        self.name = rng.choice(NAMES + TRICKY_NAMES if tricky else NAMES)
+        self.credits = rng.choice([1.0, 2.0, 3.0, 4.0])
+        self.type = rng.choice(COURSE_TYPES)
+        self.teacher = rng.choice(TEACHERS + TRICKY_TEACHERS if tricky else TEACHERS)
+        self.course_id = 5000 + lesson_id % 997  # Lessons sharing a course_id are alternatives of one course
+        self.week_day = rng.randint(1, 5)
+        self.start_unit = rng.choice([1, 3, 5, 7, 9])
+        self.lc = rng.choice([30, 60, 90, 120])
+        self.sc = rng.randint(self.lc - 5, self.lc)
+
+    def to_js_literal(self, tricky: bool = False) -> str:
+        # EAMS answers with a JavaScript object literal, not JSON
+        name = self.name.replace("'", "\\'")
+        teacher = self.teacher.replace("'", "\\'")
+        trailing = "," if tricky else ""
+        return (
+            f"{{id:{self.id},no:'{self.no}',name:'{name}',code:'C{self.course_id}',credits:{self.credits},"
+            f"courseId:{self.course_id},courseTypeName:'{self.type}',teachers:'{teacher}',"
+            f"arrangeInfo:[{{weekDay:{self.week_day},weekState:'01111111111111111',"
+            f"startUnit:{self.start_unit},endUnit:{self.start_unit + 1},rooms:'A{self.id % 500}'}}]{trailing}}}"
+        )
+
+
+class MockEAMS:
+    """
+    Keeps seat counts per course and answers the way the real server does.
+    """
+
+    def __init__(
+        self,
+        courses: int = 200,
+        first_lesson_id: int = 100000,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_interval: float = 0.0,
+        unavailable_rate: float = 0.0,
+        churn_interval: float = 0.0,
+        closed: bool = False,
+        tricky_literals: bool = False,
+        seed: int = 0,
+    ):
+        self.rng = random.Random(seed)
+        self.tricky_literals = tricky_literals
+        self.courses: dict[str, MockCourse] = {}
+        for lesson_id in range(first_lesson_id, first_lesson_id + courses):
+            self.courses[str(lesson_id)] = MockCourse(lesson_id, self.rng, tricky_literals)
+
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_interval = throttle_interval
+        self.unavailable_rate = unavailable_rate
+        self.churn_interval = churn_interval
+        self.closed = closed
+
+        self.expired_sessions: set[str] = set()
+        self.last_post_at: dict[str, float] = {}
+        self.selected: dict[str, set[str]] = {}  # JSESSIONID -> lesson ids
+        self.request_counts: dict[str, int] = {}
+
+    def course_ids(self) -> list[str]:
+        return list(self.courses)
+
+    async def _prepare(self, request: web.Request, endpoint: str):
+        """
+        Shared latency, 503 and expired-session handling. Returns a response to short-circuit with.
+        """
+        self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.unavailable_rate and self.rng.random() < self.unavailable_rate:
+            return web.Response(status=503, text=UNAVAILABLE_TEXT)
+        if request.cookies.get("JSESSIONID", "") in self.expired_sessions:
+            raise web.HTTPFound("/eams/login.action")
+        return None
+
+    def _select_one(self, session_id: str, lesson_id: str) -> str:
+        course = self.courses.get(lesson_id)
+        if course is None:
+            return NOT_FOUND_TEXT
+        selected = self.selected.setdefault(session_id, set())
+        if lesson_id in selected:
+            return ALREADY_TEXT
+        for other_id in selected:
+            other = self.courses[other_id]
+            if other.week_day == course.week_day and other.start_unit == course.start_unit:
+                return CONFLICT_TEXT
+        if course.sc >= course.lc:
+            return FULL_TEXT
+        course.sc += 1
+        selected.add(lesson_id)
+        return SUCCESS_TEXT
+
+    async def batch_operator(self, request: web.Request) -> web.Response:
+        response = await self._prepare(request, "batchOperator")
+        if response:
+            return response
+
+        session_id = request.cookies.get("JSESSIONID", "")
+        now = time.monotonic()
+        last = self.last_post_at.get(session_id)
+        self.last_post_at[session_id] = now
+        if self.throttle_interval and last is not None and now - last < self.throttle_interval:
+            return web.Response(text=THROTTLE_TEXT, content_type="text/html")
+        if self.closed:
+            return web.Response(text=CLOSED_TEXT, content_type="text/html")
+
+        form = await request.post()
+        lines = []
+        index = 0
+        while f"operator{index}" in form:
+            lesson_id = str(form[f"operator{index}"]).split(":", 1)[0]
+            lines.append(f"{lesson_id} {self._select_one(session_id, lesson_id)}")
+            index += 1
+        body = "<div>\n" + "<br>\n".join(lines) + "\n</div>"
+        return web.Response(text=body, content_type="text/html")
+
+    async def course_data(self, request: web.Request) -> web.Response:
+        response = await self._prepare(request, "data")
+        if response:
+            return response
+        # The catalog never changes while the mock runs, so it can be revalidated with 304
+        etag = f'"catalog-{len(self.courses)}-{int(self.tricky_literals)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        literals = ",".join(course.to_js_literal(self.tricky_literals) for course in self.courses.values())
+        return web.Response(text=f"var lessonJSONs = [{literals}];", content_type="text/html", headers={"ETag": etag})
+
+    async def query_std_count(self, request: web.Request) -> web.Response:
+        response = await self._prepare(request, "queryStdCount")
+        if response:
+            return response
+        counts = ",".join(f"'{lesson_id}':{{sc:{course.sc},lc:{course.lc}}}" for lesson_id, course in self.courses.items())
+        return web.Response(text=f"/*sc 当前人数, lc 人数上限*/\nwindow.lessonId2Counts={{{counts}}}", content_type="text/html")
+
+    async def elect_page(self, request: web.Request) -> web.Response:
+        response = await self._prepare(request, "stdElectCourse")
+        if response:
+            return response
+        return web.Response(text="<html><body>选课</body></html>", content_type="text/html")
+
+    async def expire_session(self, request: web.Request) -> web.Response:
+        """
+        Test hook: POST /mock/expire?JSESSIONID=... makes that session answer 302 from now on.
+        """
+        self.expired_sessions.add(request.query.get("JSESSIONID", ""))
+        return web.Response(text="ok")
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.request_counts)
+
+    async def _churn(self):
+        # Free a random seat now and then, like students dropping courses
+        while True:
+            await asyncio.sleep(self.churn_interval)
+            full = [course for course in self.courses.values() if course.sc >= course.lc]
+            if full:
+                self.rng.choice(full).sc -= 1
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/eams/stdElectCourse!batchOperator.action", self.batch_operator)
+        app.router.add_get("/eams/stdElectCourse!data.action", self.course_data)
+        app.router.add_get("/eams/stdElectCourse!queryStdCount.action", self.query_std_count)
+        app.router.add_get("/eams/stdElectCourse.action", self.elect_page)
+        app.router.add_post("/mock/expire", self.expire_session)
+        app.router.add_get("/mock/stats", self.stats)
+
+        if self.churn_interval:
+
+            async def start_churn(app):
+                app["churn"] = asyncio.create_task(self._churn())
+
+            async def stop_churn(app):
+                app["churn"].cancel()
+
+            app.on_startup.append(start_churn)
+            app.on_cleanup.append(stop_churn)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        """
+        Starts serving in the current event loop. Returns the runner; self.base_url holds the address.
+        """
+        runner = web.AppRunner(self.create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_port = runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the EAMS course selection server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--courses", type=int, default=200, help="number of lessons in the catalog")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds on top of --latency")
+    parser.add_argument("--throttle-interval", type=float, default=0.0, help="answer 请不要过快点击 to faster POSTs")
+    parser.add_argument("--unavailable-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--churn-interval", type=float, default=0.0, help="seconds between freeing a random full seat")
+    parser.add_argument("--expired", action="append", default=[], help="JSESSIONID answered with 302")
+    parser.add_argument("--closed", action="store_true", help="answer 当前选课不开放 to every selection")
+    parser.add_argument("--tricky-literals", action="store_true", help="apostrophes and trailing commas in course data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockEAMS(
+        courses=args.courses,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_interval=args.throttle_interval,
+        unavailable_rate=args.unavailable_rate,
+        churn_interval=args.churn_interval,
+        closed=args.closed,
+        tricky_literals=args.tricky_literals,
+        seed=args.seed,
+    )
+    server.expired_sessions.update(args.expired)
+    print(f"Mock EAMS serving {args.courses} lessons on http://{args.host}:{args.port}")
+    print(f"Lesson ids: {server.course_ids()[0]} .. {server.course_ids()[-1]}")
+    print(f"Point the scripts at it with SHIEP_BASE_URL=http://{args.host}:{args.port}")
+    web.run_app(server.create_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import time
+from collections import deque
+from enum import StrEnum
+
+
+class Signal(StrEnum):
+    ACCEPTED = "accepted"  # The server processed the request (selected, full, conflict, ...)
+    THROTTLED = "throttled"  # 请不要过快点击, 503 and the like
+    TIMEOUT = "timeout"
+    FAILED = "failed"  # Connection errors
+    NEUTRAL = "neutral"  # Answered, but says nothing about load (closed, unclear, redirect)
+
+
+class Pacer:
+    """
+    Pacing of one user on one server node. The pause between attempts shrinks by 10% after
+    every accepted request and doubles on a throttle, timeout or connection error, so it
+    settles just below the rate the node starts refusing. The request timeout follows the
+    measured p99 latency.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        node: str,
+        initial_interval: float,
+        min_interval: float,
+        max_interval: float,
+        timeout_floor: float,
+        timeout_ceiling: float,
+        initial_timeout: float = 1.0,
+    ):
+        self.label = label
+        self.node = node
+        self.interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling
+        self.timeout = initial_timeout
+
+        self.latencies: deque[float] = deque(maxlen=64)
+        self.counts = {signal: 0 for signal in Signal}
+        self.backoffs = 0
+        self.speedups = 0
+        self.started = time.monotonic()
+
+    def percentile(self, fraction: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def record(self, signal: Signal, latency: float | None = None):
+        self.counts[signal] += 1
+        if signal is Signal.TIMEOUT:
+            latency = self.timeout  # At least that long, so a run of timeouts lifts p99
+        if latency is not None:
+            self.latencies.append(latency)
+            if len(self.latencies) >= 8:
+                self.timeout = min(self.timeout_ceiling, max(self.timeout_floor, 2 * self.percentile(0.99)))
+
+        match signal:
+            case Signal.ACCEPTED:
+                if self.interval > self.min_interval:
+                    self.interval = max(self.min_interval, self.interval * 0.9)
+                    self.speedups += 1
+            case Signal.THROTTLED | Signal.TIMEOUT | Signal.FAILED:
+                if self.interval < self.max_interval:
+                    self.interval = min(self.max_interval, self.interval * 2)
+                    self.backoffs += 1
+
+    def accepted_per_minute(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.counts[Signal.ACCEPTED] * 60 / elapsed if elapsed > 0 else 0.0
+
+
+class PacingController:
+    """
+    Hands out one Pacer per (user label, SERVERNAME) pair.
+    """
+
+    def __init__(self, **pacer_settings):
+        self.pacer_settings = pacer_settings
+        self.pacers: dict[tuple[str, str], Pacer] = {}
+
+    def pacer(self, label: str, cookies: dict) -> Pacer:
+        node = (cookies or {}).get("SERVERNAME", "?")
+        key = (label, node)
+        if key not in self.pacers:
+            self.pacers[key] = Pacer(label, node, **self.pacer_settings)
+        return self.pacers[key]
+
+    def print_summary(self):
+        if not self.pacers:
+            return
+        print("\n--- Pacing Summary ---")
+        for pacer in self.pacers.values():
+            counts = pacer.counts
+            p50, p99 = pacer.percentile(0.50), pacer.percentile(0.99)
+            latency = f"{p50 * 1000:.0f}/{p99 * 1000:.0f} ms" if p50 is not None else "n/a"
+            print(
+                f"User {pacer.label} @ {pacer.node}: {sum(counts.values())} sent, {counts[Signal.ACCEPTED]} accepted "
+                f"({pacer.accepted_per_minute():.0f}/min), {counts[Signal.THROTTLED]} throttled, "
+                f"{counts[Signal.TIMEOUT]} timed out, {counts[Signal.FAILED]} failed; "
+                f"latency p50/p99 {latency}; {pacer.backoffs} backoff(s), {pacer.speedups} speed-up(s); "
+                f"final interval {pacer.interval:.3f}s, timeout {pacer.timeout:.2f}s"
+            )
@@ -0,0 +1,231 @@
+"""
+Pre-flight check of --start (preflight_check in config.py).
+
+The configured courses are checked against the lesson catalog of their profileId
+(stdElectCourse!data.action with its arrangeInfo time slots), instead of learning from 冲突 or
+已经选过 after a round trip:
+
+- a lesson id that is not in the catalog of its profileId is dropped, but only while that
+  catalog is younger than catalog_cache_ttl: an older one may miss lessons added since;
+- a lesson listed for a user under more than one profileId is kept under the first only;
+- a lesson that clashes with one the journal shows as selected is dropped;
+- lessons of one user that clash with each other are alternatives (siblings). They are never
+  sent in the same batch, and once one of them is selected the others are cancelled
+  without a request.
+
+No request waits for the catalogs: --start begins with the ones already in the catalog cache,
+and the missing or stale ones are fetched alongside the selection, after which the plan is
+checked again.
+
+Two lessons clash when they are lessons of the same course (courseId), or when they meet on
+the same weekday in overlapping units in at least one common week (weekState has one
+character per week). Courses of a profileId without a catalog are not checked.
+"""
+
+import asyncio
+import time
+from typing import NamedTuple
+
+from tqdm import tqdm
+
+from config import catalog_cache_ttl, inquiry_fetch_concurrency
+from task_plan import Task, TaskPlan, UserPlan
+
+
+class Slot(NamedTuple):
+    weekday: int
+    start: int
+    end: int
+    weeks: int  # Bit i is week i of weekState; -1 (every week) when it is missing
+
+
+class Lesson(NamedTuple):
+    course_id: str
+    slots: tuple[Slot, ...]
+
+
+class Catalog(NamedTuple):
+    lessons: dict[str, Lesson]  # Lesson id -> Lesson
+    fetched_at: float  # time.time() of the download, or of the last 304 revalidation
+
+
+def parse_weeks(week_state) -> int:
+    if isinstance(week_state, str) and week_state and set(week_state) <= {"0", "1"}:
+        return int(week_state[::-1], 2)
+    return -1
+
+
+def lesson_of(course: dict) -> Lesson:
+    slots = []
+    for arrange in course.get("arrangeInfo") or []:
+        try:
+            start = int(arrange["startUnit"])
+            slots.append(Slot(int(arrange["weekDay"]), start, int(arrange.get("endUnit") or start), parse_weeks(arrange.get("weekState"))))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return Lesson(str(course.get("courseId") or ""), tuple(slots))
+
+
+def clash(a: Lesson, b: Lesson) -> bool:
+    if a.course_id and a.course_id == b.course_id:
+        return True
+    return any(
+        x.weekday == y.weekday and x.start <= y.end and y.start <= x.end and x.weeks & y.weeks
+        for x in a.slots
+        for y in b.slots
+    )
+
+
+def catalog_of(courses: list, fetched_at: float) -> Catalog:
+    return Catalog({str(course.get("id")): lesson_of(course) for course in courses}, fetched_at)
+
+
+def owners_of(plan: TaskPlan) -> dict[str, UserPlan]:
+    """
+    profileId -> the first user that has it, whose cookies fetch its catalog.
+    """
+    owners: dict[str, UserPlan] = {}
+    for user in plan.users.values():
+        for task in user.tasks:
+            owners.setdefault(task.profile_id, user)
+    return owners
+
+
+def cached_catalogs(plan: TaskPlan) -> dict[str, Catalog]:
+    """
+    The catalogs of the plan's profileIds that are in the catalog cache, fresh or not.
+    Nothing is fetched, so the first batchOperator request does not wait for the network.
+    """
+    from inquire_course_info import open_catalog_cache  # Only needed while --start prepares
+
+    profile_ids = owners_of(plan)
+    catalogs = {}
+    cache = open_catalog_cache()
+    try:
+        for profile_id in profile_ids:
+            entry = cache.lookup(profile_id)
+            if entry:
+                catalogs[profile_id] = catalog_of(entry.courses, entry.fetched_at)
+    finally:
+        cache.close()
+    print(f"Pre-flight: {len(catalogs)} of {len(profile_ids)} catalog(s) found in the catalog cache.")
+    return catalogs
+
+
+async def refresh_catalogs(pool, plan: TaskPlan, preflight: "Preflight", on_refresh):
+    """
+    Fetches the catalogs of the plan that are missing or stale, with the cookies of the first
+    user that has the profileId, and calls on_refresh() once they are in the preflight.
+    A profileId that cannot be fetched keeps what it had.
+    """
+    from inquire_course_info import get_course_data, open_catalog_cache
+
+    owners = {profile_id: user for profile_id, user in owners_of(plan).items() if not preflight.fresh(profile_id)}
+    if not owners:
+        return
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(inquiry_fetch_concurrency)
+    cache = open_catalog_cache()
+
+    async def fetch(profile_id: str, user: UserPlan):
+        async with semaphore:
+            return profile_id, await get_course_data(pool.session(user.label), profile_id, dict(user.cookies), cache)
+
+    refreshed = 0
+    try:
+        for profile_id, courses in await asyncio.gather(*(fetch(profile_id, user) for profile_id, user in owners.items())):
+            if courses:
+                preflight.catalogs[profile_id] = catalog_of(courses, time.time())
+                refreshed += 1
+    finally:
+        cache.close()
+    failed = f"; {len(owners) - refreshed} could not be fetched" if refreshed < len(owners) else ""
+    tqdm.write(f"Pre-flight: {refreshed} catalog(s) refreshed in {time.monotonic() - started:.2f}s{failed}.")
+    if refreshed:
+        on_refresh()
+
+
+class Preflight:
+    def __init__(self, catalogs: dict[str, Catalog], selected: set[Task]):
+        self.catalogs = catalogs
+        self.selected = set(selected)  # From the journal, and every course selected during the run
+        self.siblings: dict[Task, tuple[Task, ...]] = {}
+        self.dropped: dict[Task, str] = {}  # Task -> kind of problem
+        self.cancelled = 0
+
+    def lesson(self, task: Task) -> Lesson | None:
+        catalog = self.catalogs.get(task.profile_id)
+        return None if catalog is None else catalog.lessons.get(task.course_id)
+
+    def fresh(self, profile_id: str) -> bool:
+        catalog = self.catalogs.get(profile_id)
+        return catalog is not None and time.time() - catalog.fetched_at < catalog_cache_ttl
+
+    def problem(self, task: Task, listed: dict[str, Task], selected: list[tuple[Task, Lesson]]) -> tuple[str, str] | None:
+        """
+        (kind, reason) when the task cannot be selected, else None.
+        """
+        if task.course_id in listed:
+            return "duplicate", f"also listed under profileId {listed[task.course_id].profile_id}"
+        if task.profile_id not in self.catalogs:
+            return None
+        lesson = self.lesson(task)
+        if lesson is None:
+            if not self.fresh(task.profile_id):
+                return None
+            return "unknown", f"not in the catalog of profileId {task.profile_id}"
+        for other, other_lesson in selected:
+            if clash(lesson, other_lesson):
+                return "clash", f"clashes with selected course {other.course_id}"
+        return None
+
+    def check(self, plan: TaskPlan) -> tuple[TaskPlan, list[tuple[Task, str]]]:
+        """
+        The plan without the courses that cannot be selected, and those of them not reported before.
+        The siblings of every remaining course are worked out again.
+        """
+        users: dict[str, UserPlan] = {}
+        dropped: list[tuple[Task, str]] = []
+        for label, user in plan.users.items():
+            selected = [(task, self.lesson(task)) for task in user.tasks if task in self.selected]
+            selected = [(task, lesson) for task, lesson in selected if lesson is not None]
+            listed: dict[str, Task] = {}
+            kept: list[Task] = []
+            for task in user.tasks:
+                found = None if task in self.selected else self.problem(task, listed, selected)
+                if found:
+                    kind, reason = found
+                    if task not in self.dropped:
+                        dropped.append((task, reason))
+                    self.dropped[task] = kind
+                    continue
+                listed.setdefault(task.course_id, task)
+                kept.append(task)
+
+            lessons = [(task, self.lesson(task)) for task in kept if task not in self.selected]
+            lessons = [(task, lesson) for task, lesson in lessons if lesson is not None]
+            for task, lesson in lessons:
+                self.siblings[task] = tuple(other for other, other_lesson in lessons if other != task and clash(lesson, other_lesson))
+            users[label] = UserPlan(label, user.cookies, tuple(kept))
+        return TaskPlan(users, list(plan.problems)), dropped
+
+    def on_selected(self, task: Task) -> tuple[Task, ...]:
+        """
+        Records a selected course and returns its siblings, which can no longer be selected.
+        """
+        self.selected.add(task)
+        return self.siblings.get(task, ())
+
+    def clashes_with(self, task: Task, batch: list[Task]) -> bool:
+        siblings = self.siblings.get(task, ())
+        return any(other in siblings for other in batch)
+
+    def print_summary(self):
+        kinds = list(self.dropped.values())
+        print("\n--- Pre-flight Summary ---")
+        print(
+            f"Dropped before sending: {len(kinds)} ({kinds.count('unknown')} not in the catalog, "
+            f"{kinds.count('duplicate')} listed twice, {kinds.count('clash')} clashing with a selected course)"
+        )
+        print(f"Cancelled after a sibling was selected: {self.cancelled}")
+        print(f"Requests avoided: at least {len(kinds) + self.cancelled}")
@@ -0,0 +1,175 @@
+import asyncio
+import contextlib
+import time
+from collections import deque
+
+
+class Budget:
+    """
+    In-flight and rate limits of one node (or of the whole process). 0 means unlimited.
+    The rate is enforced as an even spacing between requests, so users never fire in a burst.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_rate: float):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.spacing = 1 / max_rate if max_rate else 0.0
+        self.in_flight = 0
+        self.next_start = 0.0
+
+        self.queues: dict[str, deque[asyncio.Future]] = {}  # user label -> waiting requests, in turn order
+        self.arrivals = 0
+        self.granted = 0
+        self.waits: deque[float] = deque(maxlen=4096)
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def delay(self, now: float) -> float | None:
+        """
+        Seconds until this budget allows another request, or None while it is at its in-flight limit.
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return None
+        return max(0.0, self.next_start - now)
+
+    def take(self, now: float):
+        self.in_flight += 1
+        self.next_start = max(now, self.next_start) + self.spacing
+
+
+class RequestScheduler:
+    """
+    Admits every batchOperator request of every user. Each SERVERNAME node and the process
+    as a whole have an in-flight and a rate budget; within a node, waiting users take turns
+    so one account with many courses cannot starve the others.
+    """
+
+    def __init__(self, node_max_in_flight: int, node_max_rate: float, total_max_in_flight: int, total_max_rate: float):
+        self.node_max_in_flight = node_max_in_flight
+        self.node_max_rate = node_max_rate
+        self.total = Budget("total", total_max_in_flight, total_max_rate)
+        self.nodes: dict[str, Budget] = {}
+        self.wakeup = asyncio.Event()
+        self.dispatcher: asyncio.Task | None = None
+        self.closed = False
+
+    def node(self, name: str) -> Budget:
+        if name not in self.nodes:
+            self.nodes[name] = Budget(name, self.node_max_in_flight, self.node_max_rate)
+        return self.nodes[name]
+
+    @contextlib.asynccontextmanager
+    async def slot(self, label: str, node_name: str):
+        """
+        Waits for a turn on the node and yields the time.monotonic() of admission.
+        """
+        node = self.node(node_name)
+        await self.acquire(label, node)
+        try:
+            yield time.monotonic()
+        finally:
+            self.release(node)
+
+    async def acquire(self, label: str, node: Budget):
+        if self.dispatcher is None and not self.closed:
+            self.dispatcher = asyncio.create_task(self.dispatch())
+        future = asyncio.get_running_loop().create_future()
+        depth = node.depth()
+        node.arrivals += 1
+        node.depth_total += depth
+        node.max_depth = max(node.max_depth, depth + 1)
+        node.queues.setdefault(label, deque()).append(future)
+        self.wakeup.set()
+
+        queued_at = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(node)  # Granted just before the cancellation arrived
+            else:
+                self.forget(label, node, future)
+            raise
+        node.waits.append(time.monotonic() - queued_at)
+
+    def forget(self, label: str, node: Budget, future: asyncio.Future):
+        queue = node.queues.get(label)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del node.queues[label]
+
+    def release(self, node: Budget):
+        node.in_flight -= 1
+        self.total.in_flight -= 1
+        self.wakeup.set()
+
+    def grant(self, node: Budget, now: float):
+        """
+        Hands the slot to the user at the front of the node's turn order, who then goes last.
+        """
+        label, queue = next(iter(node.queues.items()))
+        del node.queues[label]
+        future = queue.popleft()
+        if queue:
+            node.queues[label] = queue
+        if future.cancelled():
+            return
+        node.take(now)
+        self.total.take(now)
+        node.granted += 1
+        future.set_result(None)
+
+    async def dispatch(self):
+        while not self.closed:
+            self.wakeup.clear()
+            next_check: float | None = None
+            now = time.monotonic()
+            progress = True
+            while progress:  # One grant per node per pass, so nodes share the total budget evenly
+                progress = False
+                for node in list(self.nodes.values()):
+                    if not node.queues:
+                        continue
+                    delays = [node.delay(now), self.total.delay(now)]
+                    if None in delays:
+                        continue
+                    if max(delays) > 0:
+                        next_check = max(delays) if next_check is None else min(next_check, max(delays))
+                        continue
+                    self.grant(node, now)
+                    progress = True
+
+            if next_check is None:
+                await self.wakeup.wait()
+            else:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.wakeup.wait(), next_check)
+
+    async def close(self):
+        """
+        Stops the dispatcher through a flag: cancelling it inside asyncio.wait_for can be
+        swallowed on Python 3.11, which left close() waiting forever.
+        """
+        self.closed = True
+        self.wakeup.set()
+        if self.dispatcher:
+            await self.dispatcher
+            self.dispatcher = None
+
+    def print_summary(self):
+        if not self.nodes:
+            return
+        print("\n--- Request Scheduler Summary ---")
+        for node in self.nodes.values():
+            waits = sorted(node.waits)
+            p50 = waits[len(waits) // 2] * 1000 if waits else 0.0
+            p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000 if waits else 0.0
+            mean_depth = node.depth_total / node.arrivals if node.arrivals else 0.0
+            print(
+                f"Node {node.name}: {node.granted} request(s) admitted; queue depth mean {mean_depth:.1f}, "
+                f"max {node.max_depth}; wait p50/p99 {p50:.0f}/{p99:.0f} ms"
+            )
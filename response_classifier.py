@@ -0,0 +1,129 @@
+import re
+from enum import StrEnum
+
+import aiohttp
+
+from config import failed_words, error_words, response_prefix_bytes
+
+
+class Outcome(StrEnum):
+    SUCCESS = "success"
+    ALREADY_SELECTED = "already-selected"
+    FULL = "full"
+    CONFLICT = "conflict"
+    THROTTLED = "throttled"
+    CLOSED = "closed"
+    ERROR = "error"
+    UNCLEAR = "unclear"
+
+
+ALREADY_SELECTED_WORD = "已经选过"
+CLOSED_WORD = "当前选课不开放"
+THROTTLED_WORD = "请不要过快点击"
+CONFLICT_WORD = "冲突"
+
+# Replies to requests naming several courses (operator0..operatorN) carry one line per course
+BATCH_LINE_SPLIT = re.compile(r"<br\s*/?>|\n")
+# Outcomes that a reply naming none of the courses can only mean for the request as a whole
+WHOLE_REQUEST_OUTCOMES = (Outcome.THROTTLED, Outcome.CLOSED, Outcome.ERROR)
+
+# When several markers appear in one reply, the first outcome in this list wins
+PRIORITY = [
+    Outcome.ALREADY_SELECTED,
+    Outcome.CONFLICT,
+    Outcome.FULL,
+    Outcome.CLOSED,
+    Outcome.THROTTLED,
+    Outcome.ERROR,
+]
+
+
+class ResponseClassifier:
+    """
+    Classifies a batchOperator reply in one regex pass over the text.
+    """
+
+    def __init__(self, failed_words: list[str], error_words: list[str]):
+        self.word_outcomes: dict[str, Outcome] = {}
+        for word in error_words:
+            self.word_outcomes[word] = Outcome.ERROR
+        for word in failed_words:
+            self.word_outcomes[word] = Outcome.CONFLICT if word == CONFLICT_WORD else Outcome.FULL
+        self.word_outcomes[CLOSED_WORD] = Outcome.CLOSED
+        self.word_outcomes[THROTTLED_WORD] = Outcome.THROTTLED
+        self.word_outcomes[ALREADY_SELECTED_WORD] = Outcome.ALREADY_SELECTED
+
+        # Longest first, so "请不要过快点击" wins over the "过快点击" error word at the same position
+        words = sorted(self.word_outcomes, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(word) for word in words))
+        self.rank = {outcome: index for index, outcome in enumerate(PRIORITY)}
+
+    def classify(self, text: str) -> tuple[Outcome, str]:
+        """
+        Returns the outcome and the marker word that decided it ("" for success or unclear).
+        """
+        best: Outcome | None = None
+        best_word = ""
+        for match in self.pattern.finditer(text):
+            word = match.group()
+            outcome = self.word_outcomes[word]
+            if best is None or self.rank[outcome] < self.rank[best]:
+                best = outcome
+                best_word = word
+                if outcome is Outcome.ALREADY_SELECTED:
+                    break
+        if best is not None:
+            return best, best_word
+        if not text.strip():
+            return Outcome.UNCLEAR, ""
+        return Outcome.SUCCESS, ""
+
+    def classify_batch(self, text: str, course_ids: list[str]) -> dict[str, tuple[Outcome, str]] | None:
+        """
+        Outcome per course of a multi-course reply, each classified from the line naming its id.
+        A throttle, closed or error reply naming no course at all applies to every course.
+        None when the reply cannot be attributed course by course.
+        """
+        lines = BATCH_LINE_SPLIT.split(text)
+        outcomes = {}
+        for course_id in course_ids:
+            named = re.compile(rf"(?<!\d){re.escape(course_id)}(?!\d)")
+            line = next((line for line in lines if named.search(line)), None)
+            if line is not None:
+                outcomes[course_id] = self.classify(named.sub("", line))
+        if len(outcomes) == len(course_ids):
+            return outcomes
+        if not outcomes:
+            outcome, word = self.classify(text)
+            if outcome in WHOLE_REQUEST_OUTCOMES:
+                return dict.fromkeys(course_ids, (outcome, word))
+        return None
+
+    async def classify_response(self, response: aiohttp.ClientResponse, prefix_bytes: int = response_prefix_bytes) -> tuple[Outcome, str]:
+        """
+        Classifies the whole body, except that a reply whose first prefix_bytes already hold
+        the top-ranked marker (already selected) is decided there: nothing later can outrank
+        it. The rest of that body is still read, so the connection goes back to the keep-alive
+        pool, but it is not decoded.
+        """
+        if prefix_bytes <= 0:
+            return self.classify(await response.text())
+
+        encoding = response.charset or "utf-8"
+        prefix = b""
+        while len(prefix) < prefix_bytes:
+            chunk = await response.content.readany()
+            if not chunk:
+                return self.classify(prefix.decode(encoding, errors="replace"))
+            prefix += chunk
+
+        outcome, word = self.classify(prefix.decode(encoding, errors="ignore"))
+        if outcome is Outcome.ALREADY_SELECTED:
+            while await response.content.readany():
+                pass
+            return outcome, word
+        body = prefix + await response.content.read()
+        return self.classify(body.decode(encoding, errors="replace"))
+
+
+CLASSIFIER = ResponseClassifier(failed_words, error_words)
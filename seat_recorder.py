@@ -0,0 +1,286 @@
+"""
+Append-only recording of queryStdCount snapshots (seat_record_path in config.py).
+
+File layout, little-endian:
+
+    b"SEATREC1"
+    b"L" + uint16 length + lesson id (utf-8)            next lesson index, counting from 0
+    b"S" + float64 time + uint32 n + n uint32 lesson indexes (ascending) + n uint16 sc + n uint16 lc
+
+A snapshot only holds the lessons whose numbers changed since the previous one, and polls
+without any change are not written, so a day of 1s polls stays in the low megabytes. 65535
+marks a count the server did not send. Each snapshot stores its columns one after the
+other, so SeatHistory reads a snapshot from a memory map with one struct call, in the same
+explicit byte order the recorder writes, so recordings move between machines unchanged.
+
+    python seat_recorder.py --lesson 100001    free-seat timeline of a lesson
+    python seat_recorder.py --top 10           lessons whose numbers changed most often
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from bisect import bisect_left
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: the recording is not locked
+    fcntl = None
+
+MAGIC = b"SEATREC1"
+LESSON = struct.Struct("<cH")
+SNAPSHOT = struct.Struct("<cdI")
+UNKNOWN = 0xFFFF
+
+
+def encode_count(value) -> int:
+    return UNKNOWN if value is None or value < 0 else min(value, UNKNOWN - 1)
+
+
+def decode_count(value: int) -> int | None:
+    return None if value == UNKNOWN else value
+
+
+class SeatHistory:
+    """
+    Read side: one pass over the record headers on open, then queries on the memory map.
+    A record cut short by a crash ends the history.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lessons: list[str] = []
+        self.index: dict[str, int] = {}
+        self.snapshots: list[tuple[float, int, int]] = []  # (time, offset of the index column, n)
+        self.end = 0  # Offset after the last complete record
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if size and self.map[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a seat recording.")
+        self.scan(size)
+
+    def scan(self, size: int):
+        data = self.map
+        offset = len(MAGIC) if size else 0
+        while offset < size:
+            kind = data[offset : offset + 1]
+            if kind == b"L":
+                if offset + LESSON.size > size:
+                    break
+                _, length = LESSON.unpack_from(data, offset)
+                if offset + LESSON.size + length > size:
+                    break
+                lesson_id = bytes(data[offset + LESSON.size : offset + LESSON.size + length]).decode("utf-8")
+                self.index[lesson_id] = len(self.lessons)
+                self.lessons.append(lesson_id)
+                offset += LESSON.size + length
+            elif kind == b"S":
+                if offset + SNAPSHOT.size > size:
+                    break
+                _, at, count = SNAPSHOT.unpack_from(data, offset)
+                if offset + SNAPSHOT.size + count * 8 > size:
+                    break
+                self.snapshots.append((at, offset + SNAPSHOT.size, count))
+                offset += SNAPSHOT.size + count * 8
+            else:
+                break
+            self.end = offset
+
+    def columns(self, offset: int, count: int) -> tuple[tuple[int, ...], tuple[int, ...], tuple[int, ...]]:
+        """
+        The index, sc and lc columns of a snapshot, little-endian whatever the machine.
+        """
+        values = struct.unpack_from(f"<{count}I{count}H{count}H", self.map, offset)
+        return values[:count], values[count : 2 * count], values[2 * count :]
+
+    def timeline(self, lesson_id: str) -> list[tuple[float, int | None, int | None]]:
+        """
+        (time, sc, lc) every time the lesson's numbers changed.
+        """
+        slot = self.index.get(str(lesson_id))
+        if slot is None:
+            return []
+        changes = []
+        for at, offset, count in self.snapshots:
+            indexes, sc, lc = self.columns(offset, count)
+            position = bisect_left(indexes, slot)
+            if position < count and indexes[position] == slot:
+                changes.append((at, decode_count(sc[position]), decode_count(lc[position])))
+        return changes
+
+    def free_seat_timeline(self, lesson_id: str) -> list[tuple[float, int | None]]:
+        """
+        (time, free seats) every time the number of free seats changed; None while unknown.
+        """
+        timeline = []
+        for at, sc, lc in self.timeline(lesson_id):
+            free = None if sc is None or lc is None else lc - sc
+            if not timeline or timeline[-1][1] != free:
+                timeline.append((at, free))
+        return timeline
+
+    def churn(self) -> Counter:
+        """
+        Lesson id -> number of snapshots that changed it, not counting its first appearance.
+        """
+        counts = Counter()
+        for _, offset, count in self.snapshots:
+            counts.update(self.columns(offset, count)[0])
+        return Counter({self.lessons[slot]: changes - 1 for slot, changes in counts.items() if changes > 1})
+
+    def latest(self) -> dict[int, tuple[int, int]]:
+        """
+        Last stored (sc, lc) per lesson index, raw, for a recorder appending to this file.
+        """
+        last = {}
+        for _, offset, count in self.snapshots:
+            indexes, sc, lc = self.columns(offset, count)
+            last.update(zip(indexes, zip(sc, lc)))
+        return last
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+class SeatRecorder:
+    """
+    Write side. Appending to an existing recording continues its lesson indexes and deltas.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.index: dict[str, int] = {}
+        self.last: dict[int, tuple[int, int]] = {}
+        self.snapshots = 0
+        self.changes = 0
+
+    def open(self):
+        """
+        Takes an exclusive lock on the file before reading it, so two commands recording to
+        the same path cannot interleave their records: the second one gets an OSError.
+        """
+        self.file = open(self.path, "ab")
+        try:
+            if fcntl:
+                try:
+                    fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise OSError(f"{self.path} is being recorded by another command") from None
+            if os.fstat(self.file.fileno()).st_size:
+                history = SeatHistory(self.path)
+                try:
+                    self.index = dict(history.index)
+                    self.last = history.latest()
+                    end = history.end or len(MAGIC)
+                finally:
+                    history.close()
+                self.file.truncate(end)  # Drop a record cut short by a crash
+            else:
+                self.file.write(MAGIC)
+                self.file.flush()
+        except BaseException:
+            self.file.close()
+            self.file = None
+            raise
+
+    def record(self, enrollments: dict, at: float | None = None) -> int:
+        """
+        Appends the lessons whose numbers differ from the last snapshot and returns how many.
+        """
+        if self.file is None:
+            return 0
+        chunks = []
+        changed = []
+        for lesson_id, item in enrollments.items():
+            slot = self.index.get(lesson_id)
+            if slot is None:
+                slot = self.index[lesson_id] = len(self.index)
+                encoded = str(lesson_id).encode("utf-8")
+                chunks.append(LESSON.pack(b"L", len(encoded)) + encoded)
+            counts = (encode_count(item.get("sc")), encode_count(item.get("lc")))
+            if self.last.get(slot) != counts:
+                self.last[slot] = counts
+                changed.append((slot, *counts))
+        if not changed:
+            return 0
+        changed.sort()
+        count = len(changed)
+        indexes, sc, lc = zip(*changed)
+        chunks.append(SNAPSHOT.pack(b"S", time.time() if at is None else at, count))
+        chunks.append(struct.pack(f"<{count}I{count}H{count}H", *indexes, *sc, *lc))
+        self.file.write(b"".join(chunks))
+        self.file.flush()
+        self.snapshots += 1
+        self.changes += count
+        return count
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            print(f"Seat recording: {self.snapshots} snapshot(s) with {self.changes} change(s) appended to {self.path}.")
+
+
+def open_recorder(path: str) -> SeatRecorder | None:
+    """
+    A recorder appending to path, or None if recording is off or the file cannot be used.
+    """
+    if not path:
+        return None
+    recorder = SeatRecorder(path)
+    try:
+        recorder.open()
+    except (OSError, ValueError) as e:
+        print(f"Not recording enrollment snapshots: {e}")
+        return None
+    return recorder
+
+
+def format_time(at: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(at))
+
+
+def main():
+    from config import seat_record_path
+
+    parser = argparse.ArgumentParser(description="Query a queryStdCount recording.")
+    parser.add_argument("path", nargs="?", default=seat_record_path)
+    parser.add_argument("--lesson", action="append", default=[], help="print the free-seat timeline of this lesson id")
+    parser.add_argument("--top", type=int, default=0, help="print the lessons that changed most often")
+    args = parser.parse_args()
+
+    if not args.path or not os.path.exists(args.path):
+        print(f"No seat recording at {args.path or '(seat_record_path is empty)'}.")
+        return
+    history = SeatHistory(args.path)
+    try:
+        if history.snapshots:
+            first, last = history.snapshots[0][0], history.snapshots[-1][0]
+            print(f"{args.path}: {len(history.snapshots)} snapshot(s) of {len(history.lessons)} lesson(s), {format_time(first)} to {format_time(last)}, {history.end / 2**20:.2f} MB.")
+        else:
+            print(f"{args.path}: no snapshots yet.")
+        for lesson_id in args.lesson:
+            print(f"\nFree seats of {lesson_id}:")
+            timeline = history.free_seat_timeline(lesson_id)
+            if not timeline:
+                print("  never recorded")
+            for at, free in timeline:
+                print(f"  {format_time(at)}  {'unknown' if free is None else free}")
+        if args.top:
+            print(f"\nTop {args.top} lessons by churn:")
+            for lesson_id, changes in history.churn().most_common(args.top):
+                print(f"  {lesson_id}: {changes} change(s)")
+    finally:
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator, Callable, Iterable
+
+import aiohttp
+
+from course_store import EnrollmentTable
+from inquire_course_info import get_enrollment_data
+
+
+class SeatScheduler:
+    """
+    Polls queryStdCount on its own interval and only lets selection attempts through
+    for courses that currently have a free seat (sc < lc). Under --workers only the parent
+    polls; the workers follow its snapshots instead.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        cookies: dict,
+        poll_interval: float,
+        recorder=None,
+    ):
+        self.session = session
+        self.cookies = cookies
+        self.poll_interval = poll_interval
+        self.recorder = recorder  # seat_recorder.SeatRecorder, gets every snapshot
+
+        self.enrollments = EnrollmentTable({})
+        self.full_until_next_poll: set[str] = set()
+        self.pending: dict[str, int] = {}  # course_id -> number of tasks waiting on it
+        self.changed = asyncio.Event()  # Set and replaced on every poll and every change of pending
+
+        self.polls = 0
+        self.failed_polls = 0
+        self.dispatched = 0
+        self.avoided = 0.0
+
+    def register(self, course_id: str):
+        self.pending[course_id] = self.pending.get(course_id, 0) + 1
+        self.wake()
+
+    def unregister(self, course_id: str):
+        count = self.pending.get(course_id, 0) - 1
+        if count > 0:
+            self.pending[course_id] = count
+        else:
+            self.pending.pop(course_id, None)
+        self.wake()
+
+    def wake(self):
+        """
+        Makes every waiting user look at its queue again.
+        """
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def is_open(self, course_id: str) -> bool:
+        if course_id in self.full_until_next_poll:
+            return False
+        counts = self.enrollments.get(course_id)
+        if counts is None:
+            return True  # Unknown to queryStdCount, fall back to blind retrying
+        return counts[0] < counts[1]
+
+    def mark_full(self, course_id: str):
+        """
+        The server just said the course is full, hold it back until the next poll.
+        """
+        self.full_until_next_poll.add(course_id)
+
+    async def wait_for_any_open(self, course_ids: Callable[[], Iterable[str]], retry_interval: float):
+        """
+        Returns once one of course_ids() has a free seat or there are none left. course_ids()
+        is asked again after every poll and every reload of the plan. Blind retrying would
+        have sent one request per retry_interval while waiting: those count as avoided.
+        """
+        started = time.monotonic()
+        try:
+            while True:
+                waiting = list(course_ids())
+                if not waiting or any(self.is_open(course_id) for course_id in waiting):
+                    break
+                await self.changed.wait()
+        finally:
+            self.avoided += (time.monotonic() - started) / retry_interval
+        if waiting:
+            self.dispatched += 1
+
+    async def poll_once(self):
+        self.take(await get_enrollment_data(self.session, self.cookies))
+
+    def take(self, enrollments: dict | None):
+        """
+        The result of a poll, made here or by the parent under --workers. None means it failed.
+        """
+        self.polls += 1
+        if not enrollments:
+            self.failed_polls += 1
+            return
+        if self.recorder:
+            self.recorder.record(enrollments)
+
+        self.enrollments = EnrollmentTable(enrollments)
+        self.full_until_next_poll.clear()
+        self.wake()
+
+    async def run(self):
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.poll_interval)
+
+    async def follow(self, snapshots: AsyncIterator[dict | None]):
+        """
+        Takes the polls of the parent under --workers instead of polling.
+        """
+        async for enrollments in snapshots:
+            self.take(enrollments)
+
+    def print_summary(self):
+        print("\n--- Seat Scheduler Summary ---")
+        print(f"Enrollment polls: {self.polls} ({self.failed_polls} failed)")
+        print(f"Attempts dispatched on free seats: {self.dispatched}")
+        print(f"Requests avoided compared with blind retrying: ~{int(self.avoided)}")
@@ -0,0 +1,91 @@
+"""
+Cold-start report for the commands of main.py.
+
+    python main.py --startup-report            # report for --start, checked against startup_budget_ms
+    python main.py --startup-report --inquire  # report for another command
+
+A fresh interpreter loads the command the way main.py does (without running it) under
+`python -X importtime`; the slowest imports are listed. The budget covers what the command's
+imports add to a cold start: the median wall time of a few plain cold starts minus that of a
+bare interpreter, so interpreter startup and machine speed count as little as possible. The
+report fails (exit code 1) when --start is over it.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+
+from config import startup_budget_ms
+
+RUNS = 5
+TOP = 15
+
+
+def cold_start(command: str | None, importtime: bool = False) -> tuple[float, str]:
+    """
+    Wall time and stderr of a fresh interpreter loading the command, or doing nothing for None.
+    """
+    code = f"import main; main.load_command({command!r})" if command else "pass"
+    interpreter = [sys.executable, "-X", "importtime"] if importtime else [sys.executable]
+    start = time.perf_counter()
+    result = subprocess.run(
+        interpreter + ["-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, result.stderr
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """
+    (self us, cumulative us, indented module name) per line of -X importtime output.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return imports
+
+
+def startup_report(command: str) -> bool:
+    from main import COMMANDS
+
+    if command not in COMMANDS:
+        print(f"Error: Unknown command {command}. Choose one of {', '.join(COMMANDS)}.")
+        return False
+
+    _, stderr = cold_start(command, importtime=True)
+    imports = parse_importtime(stderr)
+    top_level = [entry for entry in imports if not entry[2].startswith("  ")]
+
+    print(f"--- Startup report for {command} ---")
+    print(f"{len(imports)} modules imported, {sum(entry[0] for entry in imports) / 1000:.1f} ms in total")
+    print("\nSlowest imports (self time):")
+    for self_us, cumulative_us, name in sorted(imports, reverse=True)[:TOP]:
+        print(f"  {self_us / 1000:8.1f} ms  {name.strip()}")
+    print("\nTop-level imports (cumulative):")
+    for self_us, cumulative_us, name in sorted(top_level, key=lambda entry: entry[1], reverse=True)[:TOP]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    # Interleaved, so a busy moment on the machine slows both sides alike
+    commands, bare = [], []
+    for _ in range(RUNS):
+        commands.append(cold_start(command)[0])
+        bare.append(cold_start(None)[0])
+    command_ms, bare_ms = median(commands) * 1000, median(bare) * 1000
+    import_ms = command_ms - bare_ms
+    print(f"\nCold start (median of {RUNS}): {command_ms:.0f} ms, of which the bare interpreter {bare_ms:.0f} ms")
+    print(f"Import cost of {command}: {import_ms:.0f} ms")
+    if command != "--start":
+        return True
+    if import_ms > startup_budget_ms:
+        print(f"FAILED: over the import budget of {startup_budget_ms} ms (startup_budget_ms in config.py).")
+        return False
+    print(f"OK: within the import budget of {startup_budget_ms} ms.")
+    return True
@@ -0,0 +1,151 @@
+"""
+USER_CONFIGS compiled into an immutable, validated task plan.
+
+The configs come from custom.py or from a TOML/JSON file with the same USER_CONFIGS layout
+(task_plan_path in config.py):
+
+    [[USER_CONFIGS]]
+    label = "User_Alice"
+    cookies = { JSESSIONID = "...", SERVERNAME = "c1" }
+
+    [[USER_CONFIGS.tables]]
+    profileId = "114514"
+    course_ids = ["COURSEID_A1", "COURSEID_A2"]
+
+Each user's tasks are interleaved across tables (first course of every table, then the second,
+...) and de-duplicated on (user, profileId, course_id). Problems are collected instead of raised,
+so one bad table does not stop the other users.
+"""
+
+from types import MappingProxyType
+from typing import NamedTuple
+
+from file_watch import watch_file
+
+
+class Task(NamedTuple):
+    user: str
+    profile_id: str
+    course_id: str
+
+
+class UserPlan(NamedTuple):
+    label: str
+    cookies: MappingProxyType
+    tasks: tuple[Task, ...]
+
+
+class TaskPlan:
+    def __init__(self, users: dict[str, UserPlan], problems: list[str]):
+        self.users = MappingProxyType(users)
+        self.problems = tuple(problems)
+
+    def tasks(self) -> set[Task]:
+        return {task for user in self.users.values() for task in user.tasks}
+
+    def shard(self, index: int, count: int) -> "TaskPlan":
+        """
+        The users of worker index out of count (see workers.py). Problems stay with worker 0,
+        so they are printed once.
+        """
+        if count == 1:
+            return self
+        users = {label: user for label, user in self.users.items() if shard_of(label, count) == index}
+        return TaskPlan(users, list(self.problems) if index == 0 else [])
+
+    def print_problems(self):
+        for problem in self.problems:
+            print(f"Task plan: {problem}")
+
+
+def shard_of(label: str, count: int) -> int:
+    """
+    The worker of a user under --workers. It depends on the label only, so a reloaded plan
+    keeps every user on the worker that already runs it.
+    """
+    import zlib  # Only needed with --workers
+
+    return zlib.crc32(label.encode("utf-8")) % count
+
+
+def compile_plan(user_configs) -> TaskPlan:
+    users: dict[str, UserPlan] = {}
+    problems: list[str] = []
+    if not isinstance(user_configs, list):
+        return TaskPlan(users, ["USER_CONFIGS must be a list of user configs."])
+
+    for index, user_config in enumerate(user_configs):
+        if not isinstance(user_config, dict):
+            problems.append(f"entry {index} is not a dict, skipped.")
+            continue
+        label = str(user_config.get("label") or f"Unknown_User_{index}")
+        if label in users:
+            problems.append(f"label {label} is used twice, the second config is skipped.")
+            continue
+        cookies = user_config.get("cookies")
+        if not isinstance(cookies, dict) or not cookies.get("JSESSIONID"):
+            problems.append(f"user {label} has no JSESSIONID cookie, skipped.")
+            continue
+        if not cookies.get("SERVERNAME"):
+            problems.append(f"user {label} has no SERVERNAME cookie.")
+
+        columns: list[list[Task]] = []
+        for table in user_config.get("tables") or []:
+            profile_id = str(table.get("profileId") or "") if isinstance(table, dict) else ""
+            course_ids = table.get("course_ids") if isinstance(table, dict) else None
+            if not profile_id or not course_ids or not isinstance(course_ids, list):
+                problems.append(f"Missing parameter in {label}'s table: profileId={profile_id or None}, course_ids={course_ids}")
+                continue
+            columns.append([Task(label, profile_id, str(course_id)) for course_id in course_ids if str(course_id).strip()])
+
+        tasks: dict[Task, None] = {}
+        for row in range(max((len(column) for column in columns), default=0)):
+            for column in columns:
+                if row < len(column):
+                    if column[row] in tasks:
+                        problems.append(f"course {column[row].course_id} (profileId {column[row].profile_id}) is listed twice for {label}.")
+                    tasks[column[row]] = None
+        if not tasks:
+            problems.append(f"No valid tasks found for user: {label}.")
+        users[label] = UserPlan(label, MappingProxyType(dict(cookies)), tuple(tasks))
+    return TaskPlan(users, problems)
+
+
+def read_user_configs(path: str):
+    """
+    USER_CONFIGS from a .py, .toml or .json file, read fresh from disk every time.
+    """
+    # Imported per format, so --start only loads the reader its plan is written in
+    if path.endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f).get("USER_CONFIGS")
+    if path.endswith(".json"):
+        import json
+
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("USER_CONFIGS")
+    import runpy
+
+    return runpy.run_path(path).get("USER_CONFIGS")
+
+
+def load_plan(path: str) -> TaskPlan:
+    """
+    The plan to start with. For custom.py that is the already imported module, so a run
+    uses the same configs as the rest of the script.
+    """
+    if path.endswith(".py"):
+        from custom import USER_CONFIGS
+
+        return compile_plan(USER_CONFIGS)
+    return compile_plan(read_user_configs(path))
+
+
+async def watch_plan(path: str, on_change, interval: float):
+    """
+    Calls on_change(plan) with every newly compiled plan. While the file cannot be parsed
+    the running plan stays in place.
+    """
+    await watch_file(path, interval, lambda path: compile_plan(read_user_configs(path)), on_change)
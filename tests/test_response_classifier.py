@@ -0,0 +1,68 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from http_pool import SharedPool
+from response_classifier import CLASSIFIER, Outcome
+
+PREFIX_BYTES = 2048
+PADDING = "<tr><td>" + "x" * 80 + "</td></tr>\n"
+
+
+def classify_replies(*bodies: str) -> tuple[list[tuple[Outcome, str]], SharedPool]:
+    """
+    Posts once per body to a local server answering with that body, and classifies each
+    reply through classify_response on one SharedPool.
+    """
+    replies = iter(bodies)
+
+    async def reply(request: web.Request) -> web.Response:
+        return web.Response(text=next(replies), content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/", reply)
+        async with TestServer(app) as server, SharedPool(owner_label="Test") as pool:
+            results = []
+            for _ in bodies:
+                async with pool.session("test").post(server.make_url("/")) as response:
+                    results.append(await CLASSIFIER.classify_response(response, PREFIX_BYTES))
+            return results, pool
+
+    return asyncio.run(run())
+
+
+def test_higher_priority_marker_past_the_prefix_wins():
+    body = "<script onerror=x>" + PADDING * 3100 + "你已经选过该课程了"
+    assert len(body.encode()) > 300_000
+
+    (result,), _ = classify_replies(body)
+
+    assert result == (Outcome.ALREADY_SELECTED, "已经选过")
+    assert CLASSIFIER.classify(body) == result
+
+
+def test_conflict_past_the_prefix_outranks_full_inside_it():
+    body = "人数已满" + PADDING * 3100 + "与已选课程冲突"
+
+    (result,), _ = classify_replies(body)
+
+    assert result == (Outcome.CONFLICT, "冲突")
+
+
+def test_marker_only_in_the_prefix_is_kept():
+    body = "人数已满" + PADDING * 100
+
+    (result,), _ = classify_replies(body)
+
+    assert result == (Outcome.FULL, "已满")
+
+
+def test_already_selected_in_the_prefix_still_reuses_the_connection():
+    body = "你已经选过该课程了" + PADDING * 2000
+
+    results, pool = classify_replies(body, body, body)
+
+    assert results == [(Outcome.ALREADY_SELECTED, "已经选过")] * 3
+    assert (pool.stats.created, pool.stats.reused) == (1, 2)
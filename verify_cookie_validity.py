@@ -1,40 +1,34 @@
 import asyncio
+import time
 import aiohttp
-from tqdm.asyncio import tqdm
 
-from config import headers
-from custom import USE_PROXY, proxies, USER_CONFIGS, INQUIRY_USER_DATA
-
-try:
-    from aiohttp_socks import ProxyConnector
-except ImportError:
-    ProxyConnector = None
-
-check_url = "https://jw.shiep.edu.cn/eams/stdElectCourse.action"
+from config import headers, check_url, validation_concurrency, cookie_cache_path, cookie_cache_ttl
+from cookie_cache import CookieCache
+from custom import USER_CONFIGS, INQUIRY_USER_DATA
+from event_log import EVENTS, Event
+from http_pool import SharedPool
+from metrics import METRICS
 
 
 class CheckResult:
-    def __init__(self, label: str, success: bool):
+    def __init__(self, label: str, success: bool, reason: str = "", expired: bool = False):
         self.label = label
         self.success = success
+        self.reason = reason
+        self.expired = expired  # 302 to the login page: the session is gone, not just unreachable
 
 
-async def check(label: str, cookies: dict) -> CheckResult:
-    connector = None
-    if USE_PROXY:
-        if ProxyConnector and "all" in proxies:
-            proxy_url_val = proxies["all"]
-            if proxy_url_val:
-                connector = ProxyConnector.from_url(proxy_url_val)
-            else:
-                print("Warning (Inquiry): USE_PROXY is True, but proxy URL is empty. No proxy.")
-        elif not ProxyConnector:
-            print("Warning (Inquiry): USE_PROXY is True, aiohttp-socks not installed. No proxy.")
-        else:
-            print("Warning (Inquiry): USE_PROXY is True, 'all' proxy key missing. No proxy.")
+def open_cookie_cache() -> CookieCache:
+    return CookieCache(path=cookie_cache_path, ttl=cookie_cache_ttl)
 
-    try:
-        async with aiohttp.ClientSession(connector=connector) as session:
+
+async def check(session: aiohttp.ClientSession, label: str, cookies: dict, limit: asyncio.Semaphore) -> CheckResult:
+    """
+    One GET of stdElectCourse.action, while at most validation_concurrency others run.
+    """
+    async with limit:
+        started = time.monotonic()
+        try:
             async with session.get(
                 url=check_url,
                 headers=headers,
@@ -44,41 +38,50 @@ async def check(label: str, cookies: dict) -> CheckResult:
                 allow_redirects=False,
             ) as response:
                 if response.status != 200:
-                    return CheckResult(label=label, success=False)
+                    result = CheckResult(label=label, success=False, reason=f"status {response.status}", expired=response.status == 302)
+                else:
+                    result = CheckResult(label=label, success=True)
 
-    except Exception:
-        return CheckResult(label=label, success=False)
+        except Exception as e:
+            result = CheckResult(label=label, success=False, reason=repr(e))
 
-    return CheckResult(label=label, success=True)
+    METRICS.observe("defaultPage", time.monotonic() - started, "valid" if result.success else "invalid")
+    if result.success:
+        EVENTS.emit(Event.COOKIE_VALID, user=label)
+    else:
+        EVENTS.emit(Event.COOKIE_INVALID, user=label, reason=result.reason)
+    return result
 
 
 async def verify_cookie_validity():
-    all_cookies_tasks = []
-    print("Collecting cookies...")
+    async with EVENTS, SharedPool(owner_label="Validation") as pool:
+        await verify_all_cookies(pool)
 
-    all_cookies_tasks.append(
-        check(
-            label=INQUIRY_USER_DATA.get("label", "Unknown_User"),
-            cookies=INQUIRY_USER_DATA.get("cookies"),
-        )
-    )
 
+async def verify_all_cookies(pool: SharedPool):
+    from tqdm.asyncio import tqdm  # --start imports this module for check() only
+
+    print("Collecting cookies...")
+    users = [(INQUIRY_USER_DATA.get("label", "Unknown_User"), INQUIRY_USER_DATA.get("cookies"))]
     for user_config in USER_CONFIGS:
-        all_cookies_tasks.append(
-            check(
-                label=user_config.get("label", "Unknown_User"),
-                cookies=user_config.get("cookies"),
-            )
-        )
+        users.append((user_config.get("label", "Unknown_User"), user_config.get("cookies")))
 
-    if not all_cookies_tasks:
-        print("Cannot find any cookies.")
-        return
+    limit = asyncio.Semaphore(validation_concurrency)
+    all_cookies_tasks = [check(session=pool.session(label), label=label, cookies=cookies, limit=limit) for label, cookies in users]
 
     print(f"Starting verification of all {len(all_cookies_tasks)} cookies...\n")
     results: list[CheckResult] = await tqdm.gather(*all_cookies_tasks, desc="Overall Cookies Verification Progress")
 
+    cache = open_cookie_cache()
+    try:
+        for (label, cookies), result in zip(users, results):
+            if cookies:
+                cache.store(label, cookies, result.success, result.expired, result.reason)
+    finally:
+        cache.close()
+
     print("\nAll cookies verification tasks have been processed.")
+    pool.print_stats()
     await asyncio.sleep(0.1)
 
     invalid_results: list[CheckResult] = []
@@ -95,6 +98,6 @@ async def verify_cookie_validity():
     if invalid_results:
         print("\n--- Invalid Cookies Details ---")
         for peer in invalid_results:
-            print(f"[INVALID] User: {peer.label}")
+            print(f"[INVALID] User: {peer.label} ({peer.reason})")
 
     print()
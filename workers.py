@@ -0,0 +1,311 @@
+"""
+--start --workers N: the users of USER_CONFIGS sharded across N selection processes.
+
+Each worker is a fresh process (multiprocessing "spawn", the same on Windows and Linux) with
+its own event loop, connection pool, request scheduler and pacing. It selects for the users
+whose label hashes to it (task_plan.shard_of), so a reloaded plan keeps every user on the
+worker that already runs it; a worker that starts with no users is not spawned, so users a
+reload assigns to it are not picked up.
+
+Workers send their progress, journal records, failures and metrics to the parent over one
+queue. The parent owns the journal (so --resume works with any number of workers), shows the
+one progress bar and prints the failures of all workers together. The per-node and total
+request budgets of config.py are split evenly between the workers, so N workers put no more
+load on a node than one process does. Every worker writes its own event log, events.jsonl.w<N>.
+
+With --seats the parent polls queryStdCount once for all workers and sends every result to
+each of them over a queue of its own, so the poll load does not grow with N. Only the parent
+records the snapshots.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import pickle
+import queue
+import threading
+
+from tqdm import tqdm
+
+from config import seat_poll_interval, seat_record_path, worker_report_interval
+from custom import INQUIRY_USER_DATA
+from http_pool import SharedPool
+from journal import JOURNAL, TaskState
+from metrics import METRICS, Metrics
+from task_plan import Task, TaskPlan, shard_of
+
+
+def configure_worker(index: int, count: int):
+    """
+    Changes the settings of a worker before the modules that read them are imported.
+    """
+    import config
+
+    config.event_log_path = f"{config.event_log_path}.w{index}"
+    config.console_max_lines_per_second = max(1, config.console_max_lines_per_second // count)
+    config.node_max_in_flight = math.ceil(config.node_max_in_flight / count)  # 0 stays unlimited
+    config.node_max_rate = config.node_max_rate / count
+    config.total_max_in_flight = math.ceil(config.total_max_in_flight / count)
+    config.total_max_rate = config.total_max_rate / count
+    config.seat_record_path = ""  # The parent polls queryStdCount with --seats and records it
+
+
+class Reporter:
+    """
+    A worker's end of the queue to the parent.
+    """
+
+    def __init__(self, index: int, count: int, outbox, seats=None):
+        self.index = index
+        self.count = count
+        self.outbox = outbox
+        self.seats = seats  # The parent's queryStdCount polls with --seats
+        self.progress = RemoteProgress(self)
+
+    def send(self, kind: str, *payload):
+        self.outbox.put((kind, self.index, *payload))
+
+    def send_metrics(self, kind: str = "metrics", *payload):
+        # Pickled here: the queue pickles in its feeder thread, while the loop keeps changing METRICS
+        self.send(kind, *payload, pickle.dumps(METRICS))
+
+    async def run(self, selection):
+        """
+        Awaits the worker's selection and sends a metrics snapshot every worker_report_interval seconds meanwhile.
+        """
+        sender = asyncio.create_task(self.report_metrics())
+        try:
+            await selection
+        finally:
+            sender.cancel()
+
+    async def report_metrics(self):
+        while True:
+            await asyncio.sleep(worker_report_interval)
+            self.send_metrics()
+
+    async def seat_snapshots(self):
+        """
+        The results of the parent's queryStdCount polls, None for a failed one. When several
+        have arrived only the newest is taken.
+        """
+        while True:
+            if snapshots := await asyncio.to_thread(receive, self.seats, 0.5):
+                yield snapshots[-1]
+
+
+class RemoteProgress:
+    """
+    Takes the place of a worker's tqdm bar: the counts go to the parent's bar.
+    """
+
+    def __init__(self, reporter: Reporter):
+        self.reporter = reporter
+        self.total = 0
+        self.n = 0
+
+    def update(self, n: int = 1):
+        self.n += n
+        self.refresh()
+
+    def refresh(self):
+        self.reporter.send("progress", self.total, self.n)
+
+    def close(self):
+        pass
+
+
+class RemoteJournal:
+    """
+    Takes the place of JOURNAL in a worker: state changes go to the parent, which journals them.
+    """
+
+    def __init__(self, reporter: Reporter, selected: list[Task]):
+        self.reporter = reporter
+        self.selected = selected  # Replayed by the parent with --resume
+
+    async def open(self, resume: bool) -> dict[Task, TaskState]:
+        return dict.fromkeys(self.selected, TaskState.SELECTED)
+
+    def record(self, task: Task, state: TaskState):
+        self.reporter.send("journal", task, state)
+
+    async def close(self):
+        pass
+
+
+def run_worker(index: int, count: int, endless: bool, seat_driven: bool, selected: list[Task], outbox, seats):
+    """
+    Entry point of a worker process.
+    """
+    configure_worker(index, count)
+    # tqdm.write takes a multiprocessing lock by default; a terminated worker would leak its semaphore
+    tqdm.set_lock(threading.RLock())
+    import main_select_courses as selection
+
+    reporter = Reporter(index, count, outbox, seats)
+    selection.REPORTER = reporter
+    selection.JOURNAL = RemoteJournal(reporter, selected)
+    try:
+        asyncio.run(reporter.run(selection.main_select_courses(endless=endless, seat_driven=seat_driven)))
+    except KeyboardInterrupt:
+        outbox.cancel_join_thread()  # The parent got the same Ctrl+C and may no longer be reading
+        return
+    reporter.send_metrics("done", selection.failed_courses)
+
+
+def receive(inbox, timeout: float) -> list[tuple]:
+    """
+    Runs in a worker thread: waits up to timeout for a message, then takes whatever else has arrived.
+    """
+    try:
+        messages = [inbox.get(timeout=timeout)]
+    except queue.Empty:
+        return []
+    try:
+        while len(messages) < 1000:
+            messages.append(inbox.get_nowait())
+    except queue.Empty:
+        pass
+    return messages
+
+
+class Collector:
+    """
+    The parent's view of the workers: one progress bar, the journal, the failures and METRICS
+    rebuilt from the latest metrics snapshot of every worker.
+    """
+
+    def __init__(self, processes: dict[int, multiprocessing.Process]):
+        self.processes = processes
+        self.counts: dict[int, tuple[int, int]] = {}  # Worker -> (users, users finished)
+        self.snapshots: dict[int, Metrics] = {}
+        self.own = Metrics()  # The parent's queryStdCount polls with --seats
+        self.failed: list[dict] = []
+        self.finished: set[int] = set()
+        self.crashed: dict[int, int] = {}  # Worker -> exit code
+        self.progress = tqdm(total=0, desc="Total Course Selection Progress")
+
+    async def run(self, inbox):
+        while len(self.finished) + len(self.crashed) < len(self.processes):
+            messages = await asyncio.to_thread(receive, inbox, 0.5)
+            for message in messages:
+                self.handle(*message)
+            if not messages:
+                self.check_exits(inbox)
+
+    def handle(self, kind: str, index: int, *payload):
+        match kind:
+            case "journal":
+                JOURNAL.record(*payload)
+            case "progress":
+                self.counts[index] = payload
+                self.progress.total = sum(total for total, _ in self.counts.values())
+                self.progress.n = sum(done for _, done in self.counts.values())
+                self.progress.refresh()
+            case "metrics":
+                self.merge_metrics(index, payload[0])
+            case "done":
+                failed, snapshot = payload
+                self.failed += failed
+                self.merge_metrics(index, snapshot)
+                self.finished.add(index)
+
+    def merge_metrics(self, index: int, snapshot: bytes):
+        self.snapshots[index] = pickle.loads(snapshot)
+        self.rebuild_metrics()
+
+    def rebuild_metrics(self):
+        METRICS.clear()
+        METRICS.merge(self.own)
+        for metrics in self.snapshots.values():
+            METRICS.merge(metrics)
+
+    def check_exits(self, inbox):
+        exited = [index for index, process in self.processes.items() if process.exitcode is not None and index not in self.finished]
+        if not exited:
+            return
+        for message in receive(inbox, 0.1):  # What a worker sent just before exiting
+            self.handle(*message)
+        for index in exited:
+            if index not in self.finished:
+                self.crashed[index] = self.processes[index].exitcode
+                print(f"\nWorker {index} exited with code {self.crashed[index]} before finishing; its remaining courses were not selected.")
+
+    def close(self):
+        self.progress.close()
+
+
+async def run_workers(plan: TaskPlan, count: int, endless: bool, seat_driven: bool, resume: bool):
+    from main_select_courses import print_failed_courses
+
+    context = multiprocessing.get_context("spawn")
+    inbox = context.Queue()
+    states = await JOURNAL.open(resume)
+    selected = [task for task, state in states.items() if state is TaskState.SELECTED]
+
+    processes = {}
+    seats = {}
+    for index in range(count):
+        if not plan.shard(index, count).users:
+            continue
+        own = [task for task in selected if shard_of(task.user, count) == index]
+        seats[index] = context.Queue() if seat_driven else None
+        processes[index] = context.Process(
+            target=run_worker,
+            args=(index, count, endless, seat_driven, own, inbox, seats[index]),
+            name=f"selection-worker-{index}",
+        )
+    print(f"\nStarting selection for {len(plan.users)} user(s) in {len(processes)} worker process(es)...\n")
+    for process in processes.values():
+        process.start()
+
+    collector = Collector(processes)
+    poller = None
+    if seat_driven:
+        print(f"Seat-driven mode: polling enrollment every {seat_poll_interval}s for all workers.")
+        poller = asyncio.create_task(poll_seats(list(seats.values()), collector.own))
+    try:
+        await collector.run(inbox)
+    finally:
+        if poller:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            collector.rebuild_metrics()
+        for index, process in processes.items():
+            if index not in collector.finished:
+                process.terminate()  # Only when the parent was cancelled or interrupted
+            process.join()
+        inbox.close()
+        inbox.join_thread()
+        for outbox in seats.values():
+            if outbox:
+                outbox.cancel_join_thread()  # A finished worker no longer reads its polls
+                outbox.close()
+        collector.close()
+        await JOURNAL.close()
+    print_failed_courses(collector.failed)
+
+
+async def poll_seats(outboxes: list, metrics: Metrics):
+    """
+    Polls queryStdCount every seat_poll_interval seconds for the workers of --seats and puts
+    every result, None for a failed poll, on each worker's queue.
+    """
+    from inquire_course_info import get_enrollment_data  # Pulls in the enrollment parser, only needed with --seats
+    from seat_recorder import open_recorder
+
+    recorder = open_recorder(seat_record_path)
+    try:
+        async with SharedPool(owner_label="Seats") as pool:
+            session = pool.session(INQUIRY_USER_DATA.get("label", "Unknown_User"))
+            while True:
+                enrollments = await get_enrollment_data(session, INQUIRY_USER_DATA.get("cookies"), metrics)
+                if enrollments and recorder:
+                    recorder.record(enrollments)
+                for outbox in outboxes:
+                    outbox.put(enrollments)
+                await asyncio.sleep(seat_poll_interval)
+    finally:
+        if recorder:
+            recorder.close()